@@ -26,15 +26,18 @@
 ################################################################################
 # System imports
 
+import sys
 import time
 import math    # do not use numpy in common, to avoid making common to elaborate
 import numpy as np
 import operator
 import inspect
+import functools
 import itertools 
+import collections
 import os
+import mmap
 import os.path
-from functools import reduce
 
 ################################################################################
 # Constants
@@ -65,19 +68,39 @@ c_longword_sign  = 2**(c_longword_w-1)  # = 0x01000000000000000
 
 c_nof_complex    = 2
 
+c_bitmasks       = tuple((1<<i)-1 for i in range(2*c_longword_w+1))   # c_bitmasks[n] = bitmask for n bits
+
+# numpy word and word pair dtype names for the concat_complex() and unconcat_complex() view casts
+c_concat_dtypes  = {c_byte_w:     ('uint8',  'uint16'),
+                    c_halfword_w: ('uint16', 'uint32'),
+                    c_word_w:     ('uint32', 'uint64')}
+
+# Python and numpy number types, for which numpy can be used instead of a Python loop
+c_numeric_types  = (int, float, complex, np.number)
+
 
 ################################################################################
 # Functions
 
+def _numeric_array(in_list, kinds):
+    """Return in_list as one dimensional numpy array if its dtype kind is in kinds, else None"""
+    if len(in_list) == 0:
+        return None
+    if not isinstance(in_list, np.ndarray) and not isinstance(in_list[0], c_numeric_types):
+        return None   # skip conversion of obviously non numeric list
+    try:
+        a = np.asarray(in_list)
+    except (ValueError, TypeError):
+        return None   # e.g. ragged list
+    if a.ndim == 1 and a.dtype.kind in kinds:
+        return a
+    return None
+
 def greatest_common_div(A, B):
     """
     Find the greatest common divisor of A and B.
     """
-    while B != 0:
-        rem = A % B
-        A = B
-        B = rem
-    return A
+    return math.gcd(A, B)
 
 def ceil_div(num, den):
     """ Return integer ceil value of num / den """
@@ -85,11 +108,14 @@ def ceil_div(num, den):
     
 def ceil_log2(num):
     """ Return integer ceil value of log2(num) """
-    return int(math.ceil(math.log(int(num), 2) ) )
+    n = int(num)
+    if n <= 1:
+        return 0
+    return (n-1).bit_length()   # use integer bit length to avoid float rounding errors of log()
 
 def ceil_pow2(num):
     """ Return power of 2 value that is equal or greater than num """
-    return 2**ceil_log2(num)
+    return 1 << ceil_log2(num)
     
 def sel_a_b(sel, a, b):
     if sel==True:
@@ -129,6 +155,8 @@ def int_clip(inp, w, symmetric=False):
     # Description: Output range -2**(w-1) to +2**(w-1)-1
     # Return:
     # - outp     = Clipped value
+    if isinstance(inp, np.ndarray):
+        return int_clip_array(inp, w, symmetric)
     outp=0
     if w>0:
         clip_p= 2**(w-1)-1
@@ -136,14 +164,45 @@ def int_clip(inp, w, symmetric=False):
             clip_n=-2**(w-1)+1
         else:
             clip_n=-2**(w-1)
-        if inp > clip_p:
-            outp=clip_p
-        elif inp < clip_n:
-            outp=clip_n
-        else:
-            outp=inp
+        outp=max(clip_n, min(inp, clip_p))
     return outp
 
+def _int_dtype(dtype, w, funcName):
+    # Purpose : Check that dtype is a signed numpy integer dtype with room for w bits
+    # Input:
+    # - dtype    = numpy dtype
+    # - w        = Number of bits that the values need, including the sign bit
+    # - funcName = Name of the calling function for the error message
+    # Return:
+    # - dtype    = The dtype as np.dtype, else raise ValueError
+    dtype = np.dtype(dtype)
+    if dtype.kind != 'i':
+        raise ValueError('%s: dtype %s is not a signed integer dtype' % (funcName, dtype))
+    if w > dtype.itemsize*8:
+        raise ValueError('%s: dtype %s has no room for %d bits' % (funcName, dtype, w))
+    return dtype
+
+def int_clip_array(inp, w, symmetric=False, dtype=None):
+    # Purpose : Clip an array of integer values to w bits
+    # Input:
+    # - inp      = Integer values, list or numpy array
+    # - w        = Output width in number of bits
+    # - dtype    = numpy integer dtype for the values, e.g. np.int16 or np.int32 for less memory
+    #              traffic, default None keeps dtype of inp
+    # Description: Same as int_clip(), but clips all values in one numpy pass
+    # Return:
+    # - outp     = Clipped values as numpy array
+    inp = np.asarray(inp, dtype=dtype)
+    _int_dtype(inp.dtype, 0, 'int_clip_array')
+    if w > np.iinfo(inp.dtype).bits:
+        return inp   # all values already fit in w bits
+    if w>0:
+        clip_p = (1<<(w-1))-1
+        clip_n = -(1<<(w-1)) + (1 if symmetric else 0)
+        return np.clip(inp, clip_n, clip_p)
+    else:
+        return np.zeros_like(inp)
+
 def int_wrap(inp, w):
     # Purpose: Wrap an integer value to w bits
     # Input:
@@ -156,12 +215,28 @@ def int_wrap(inp, w):
     if w>0:
         wrap_mask=2**(w-1)-1
         wrap_sign=2**(w-1)
-        if (inp & wrap_sign) == 0:
-            outp=inp & wrap_mask
-        else:
-            outp=(inp & wrap_mask) - wrap_sign
+        outp=(inp & wrap_mask) - (inp & wrap_sign)
     return outp
 
+def int_wrap_array(inp, w, dtype=np.int64):
+    # Purpose: Wrap an array of integer values to w bits
+    # Input:
+    # - inp      = Integer values, list or numpy array
+    # - w        = Output width in number of bits
+    # - dtype    = numpy integer dtype for the values, e.g. np.int16 or np.int32 for less memory traffic
+    # Description: Same as int_wrap(), but wraps all values in one numpy pass
+    # Return:
+    # - outp     = Wrapped values as numpy array
+    inp = np.asarray(inp, dtype=_int_dtype(dtype, 0, 'int_wrap_array'))
+    if w >= np.iinfo(inp.dtype).bits:
+        return inp   # all values already fit in w bits
+    if w>0:
+        wrap_mask = (1<<(w-1))-1
+        wrap_sign = 1<<(w-1)
+        return (inp & wrap_mask) - (inp & wrap_sign)
+    else:
+        return np.zeros_like(inp)
+
 def int_round(inp, r, direction="HALF_AWAY", clip=False, outp_w=0):
     # Purpose : Round the r LSbits of an integer value
     # Input:
@@ -180,6 +255,10 @@ def int_round(inp, r, direction="HALF_AWAY", clip=False, outp_w=0):
     #   integer division: x // y = floor(x / y)
     # Return:
     # - outp     = Rounded integer value
+    if isinstance(inp, np.ndarray):
+        if not np.can_cast(inp.dtype, np.int64):
+            raise ValueError('int_round: inp dtype %s does not fit in int64' % inp.dtype)
+        return int_round_array(inp, r, direction, clip, outp_w)
     outp=inp
     if r>0:
         round_factor=2**r
@@ -205,6 +284,40 @@ def int_round(inp, r, direction="HALF_AWAY", clip=False, outp_w=0):
                 outp = clip_max
     return outp
 
+def int_round_array(inp, r, direction="HALF_AWAY", clip=False, outp_w=0, dtype=np.int64):
+    # Purpose : Round the r LSbits of an array of integer values
+    # Input:
+    # - inp       = Integer values, list or numpy array
+    # - dtype     = numpy signed integer dtype for the values, e.g. np.int16 or np.int32 for less memory
+    #               traffic, the values + 0.5 for rounding must still fit in dtype, else ValueError
+    # - other arguments as for int_round()
+    # Description: Same as int_round(), but the direction is only evaluated once and then all
+    #   values are rounded in one numpy pass, without branches per value.
+    # Return:
+    # - outp     = Rounded integer values as numpy array
+    dtype = _int_dtype(dtype, r+1, 'int_round_array')
+    outp = np.asarray(inp, dtype=dtype)
+    if r>0:
+        round_mask = (1<<r)-1
+        round_p = 1<<(r-1)   # = 0.5, = half
+        round_n = round_p-1
+        if dtype != np.int64 and outp.size > 0 and outp.max() > np.iinfo(dtype).max - round_p:
+            raise ValueError('int_round_array: dtype %s has no room for the rounding carry' % dtype)
+        if direction == "HALF_UP":
+            outp = (outp + round_p) >> r
+        elif direction == "HALF_AWAY":
+            outp = (outp + round_n + (outp >= 0)) >> r   # Round half up for positive, half down for negative
+        elif direction == "HALF_EVEN":
+            is_half = (outp & round_mask) == round_p
+            outp = (outp + round_p) >> r   # Round to nearest using floor(x/y + 0.5)
+            outp = outp - ((outp & 1) & is_half)   # Round half to even, so when odd subtract 1
+        else:
+            print('int_round_array: Error: unsupported round direction')
+        if clip:
+            clip_max = min((1<<(outp_w-1))-1, np.iinfo(outp.dtype).max)  # signed max
+            outp = np.minimum(outp, clip_max)
+    return outp
+
 
 def uint_round(inp, r, direction="HALF_UP", clip=False, outp_w=0):
     # Purpose : Round the r LSbits of an natural value
@@ -267,7 +380,11 @@ def int_requantize(inp, inp_w, outp_w, lsb_w=0, lsb_round=False, msb_clip=False,
     # Description: First round or truncate the LSbits, then clip or wrap the MSbits and then apply optional output gain
     # Return:
     # - outp     = Requantized value
-    
+    if isinstance(inp, np.ndarray):
+        if not np.can_cast(inp.dtype, np.int64):
+            raise ValueError('int_requantize: inp dtype %s does not fit in int64' % inp.dtype)
+        return int_requantize_array(inp, inp_w, outp_w, lsb_w, lsb_round, msb_clip, gain_w)
+
     # Input width
     r = int_wrap(inp, inp_w)
     # Remove LSBits using ROUND or TRUNCATE
@@ -285,14 +402,95 @@ def int_requantize(inp, inp_w, outp_w, lsb_w=0, lsb_round=False, msb_clip=False,
     outp = int_wrap(r, outp_w)
     return outp
 
+def make_requantizer(inp_w, outp_w, lsb_w=0, lsb_round=False, msb_clip=False, gain_w=0):
+    # Purpose : Create a requantize function for fixed requantize arguments
+    # Input:
+    # - arguments as for int_requantize()
+    # Description: Generate the source code of a requantize(inp) function in which the masks, shifts and
+    #   clip levels are constants and in which the stages that are not needed are left out, e.g. the
+    #   output gain when gain_w = 0. The returned requantize(inp) yields the same as int_requantize(inp, ...).
+    # Usage example at Python prompt after import as cm:
+    #  req = cm.make_requantizer(18, 12, 6, True, True, 0)
+    #  [req(d) for d in range(-2**17, 2**17, 1000)]
+    # Return:
+    # - requantize = function with integer value inp as argument, that returns the requantized value
+    def wrap_line(w):
+        if w>0:
+            return '    r = (r & %d) - (r & %d)' % (2**(w-1)-1, 2**(w-1))
+        else:
+            return '    r = 0'
+
+    lines = ['def requantize(inp):', '    r = inp']
+    # Input width
+    lines.append(wrap_line(inp_w))
+    # Remove LSBits using ROUND or TRUNCATE
+    if lsb_w>0:
+        if lsb_round:
+            lines.append('    r = (r + %d) >> %d if r >= 0 else (r + %d) >> %d' % (2**(lsb_w-1), lsb_w, 2**(lsb_w-1)-1, lsb_w))
+        else:
+            lines.append('    r = r >> %d' % lsb_w)
+    # Remove MSBits using CLIP or WRAP
+    if msb_clip and outp_w>0:
+        lines.append('    r = max(%d, min(r, %d))' % (-2**(outp_w-1), 2**(outp_w-1)-1))
+    else:
+        lines.append(wrap_line(outp_w))
+    # Output gain
+    if gain_w>0:
+        lines.append('    r = r << %d' % gain_w)
+        lines.append(wrap_line(outp_w))
+    lines.append('    return r')
+    namespace = {}
+    exec('\n'.join(lines), namespace)
+    return namespace['requantize']
+
+def int_requantize_array(inp, inp_w, outp_w, lsb_w=0, lsb_round=False, msb_clip=False, gain_w=0, dtype=np.int64):
+    # Purpose : Requantize an array of integer values similar as common_requantize.vhd
+    # Input:
+    # - inp       = Integer values, list or numpy array
+    # - dtype     = numpy signed integer dtype for the values, e.g. np.int16 or np.int32 for less memory
+    #               traffic, the dtype must fit inp_w plus the rounding carry and outp_w + gain_w, else ValueError
+    # - other arguments as for int_requantize()
+    # Description: Same as int_requantize(), but each stage is one numpy pass over all values
+    # Return:
+    # - outp     = Requantized values as numpy array
+    carry_w = 1 if lsb_round and lsb_w>0 else 0
+    dtype = _int_dtype(dtype, max(inp_w + carry_w, outp_w + gain_w), 'int_requantize_array')
+
+    # Input width
+    r = int_wrap_array(inp, inp_w, dtype)
+    # Remove LSBits using ROUND or TRUNCATE
+    if lsb_round:
+        r = int_round_array(r, lsb_w, dtype=dtype)
+    elif lsb_w>0:
+        r = r >> lsb_w
+    # Remove MSBits using CLIP or WRAP
+    if msb_clip:
+        r = int_clip_array(r, outp_w)
+    else:
+        r = int_wrap_array(r, outp_w, dtype)
+    # Output gain
+    r = r<<gain_w
+    outp = int_wrap_array(r, outp_w, dtype)
+    return outp
+
   
+def _flattenable(el):
+    """Return True if flatten() has to flatten el further, so el is iterable, but not a string or tuple."""
+    return hasattr(el, "__iter__") and not isinstance(el, str) and not isinstance(el, tuple)
+
 def flatten(x):
     """
     Flatten lists of lists of any depth. Preserves tuples.
     """
+    # Fast path for a list of flat lists, only use recursion when a deeper nesting is detected. Only for a list x,
+    # because an iterator x would already be consumed by the check.
+    if isinstance(x, list) and all(type(el) is list for el in x):
+        result = list(itertools.chain.from_iterable(x))
+        if not any(_flattenable(el) for el in result):
+            return result
     result = []
     for el in x:
-        if hasattr(el, "__iter__") and not isinstance(el, str) and type(el)!=tuple and not issubclass(type(el), tuple):
+        if _flattenable(el):
             result.extend(flatten(el))
         else:
             result.append(el)
@@ -317,12 +515,14 @@ def do_until(method, val, op=operator.eq, ms_retry=10, s_timeout=4, **kwargs):
             if time.time() - start >= s_timeout:
                 print('do_until: Timeout occured!')
                 return 'Timeout'
-        data = []
         if len(kwargs) > 0:
-            data.append(method(**kwargs))
+            data = method(**kwargs)
         else:
-            data.append(method())
-        flat_data = flatten(data)
+            data = method()
+        if _flattenable(data):
+            flat_data = flatten(data)
+        else:
+            flat_data = [data]
         list_ok = 1
         for i in range(0, len(flat_data)):
             if not op(flat_data[i], val):
@@ -348,53 +548,112 @@ def reverse_byte(byte):
     #return (byte * 0x0202020202L & 0x010884422010L) % 1023
     return(byte * 0x0202020202 & 0x010884422010) % 1023  # PD: check
 
+def reverse_byte_array(arr):
+    """
+    Reverse the bits of each byte in arr, using the same multiply trick as reverse_byte().
+    
+    Returns numpy array of uint8.
+    """
+    a = np.asarray(arr).astype(np.uint64)
+    return ((a * 0x0202020202 & 0x010884422010) % 1023).astype(np.uint8)
+
+# Lookup table with the bit reversed value for each byte value, for use with bytes.translate()
+c_reverse_byte_table = bytes(reverse_byte(b) for b in range(256))
+
+def reverse_bytes(buf):
+    """
+    Reverse the bits of each byte in buf, e.g. a packet buffer of type bytes, bytearray or memoryview.
+    
+    Uses bytes.translate() with a lookup table, so the loop over all bytes runs in C. Returns bytes.
+    """
+    return bytes(buf).translate(c_reverse_byte_table)
+
 def reverse_word(word):
     """
     Fast way to reverse a word on 64-bit platforms.
+    
+    Swaps adjacent bits, bit pairs, nibbles, bytes and halfwords using shift-mask-or steps.
+    """
+    x = word & c_word_mask
+    x = ((x >> 1) & 0x55555555) | ((x & 0x55555555) << 1)
+    x = ((x >> 2) & 0x33333333) | ((x & 0x33333333) << 2)
+    x = ((x >> 4) & 0x0F0F0F0F) | ((x & 0x0F0F0F0F) << 4)
+    x = ((x >> 8) & 0x00FF00FF) | ((x & 0x00FF00FF) << 8)
+    x = (x >> 16) | ((x & 0x0000FFFF) << 16)
+    return x
+
+def reverse_word_array(arr):
+    """
+    Reverse the bits of each 32 bit word in arr, using the same steps as reverse_word().
+    
+    Returns numpy array of uint32.
+    """
+    x = np.asarray(arr).astype(np.uint32)
+    x = ((x >> 1) & 0x55555555) | ((x & 0x55555555) << 1)
+    x = ((x >> 2) & 0x33333333) | ((x & 0x33333333) << 2)
+    x = ((x >> 4) & 0x0F0F0F0F) | ((x & 0x0F0F0F0F) << 4)
+    x = ((x >> 8) & 0x00FF00FF) | ((x & 0x00FF00FF) << 8)
+    x = (x >> 16) | (x << 16)
+    return x
+
+def _binop_list(aList, bArg, op):
     """
-    B0 = (word & 0xFF)
-    B1 = (word & 0xFF00) >> 8
-    B2 = (word & 0xFF0000) >> 16
-    B3 = (word & 0xFF000000) >> 24
-    reversed_word = (reverse_byte(B0) << 24) | (reverse_byte(B1) << 16) | (reverse_byte(B2) << 8) | (reverse_byte(B3))
-    return reversed_word
+    Apply operator op element by element on list a and list b or on list a and value b, return result as list
+    
+    A numpy array a is calculated with numpy in one pass. Other lists are calculated per element in Python,
+    because converting them to numpy and back costs more than the Python loop, and because Python integers
+    do not overflow like the numpy int64.
+    """
+    if isinstance(aList, np.ndarray):
+        return op(aList, np.asarray(bArg)).tolist()   # numpy broadcasts a value b
+    if isinstance(bArg, np.ndarray):
+        bArg = bArg.tolist()   # Python scalar or list
+    if isinstance(bArg, (list, tuple)) and len(bArg)==1:
+        bArg = bArg[0]         # apply value b to all elements in list a
+    if isinstance(bArg, (list, tuple)):
+        return list(map(op, aList, bArg))
+    return list(map(op, aList, itertools.repeat(bArg, len(aList))))
 
 def add_list(aList, bArg):
     """
     Element by element add list b to list a or add value b to each element in list a 
     """
-    aLen  = len(aList)
-    bList = listify(bArg)
-    if len(bList)==1:
-        bList = bList[0]*aLen
-    s = []
-    for i in range(aLen):
-        s.append(aList[i] + bList[i])
-    return s
+    return _binop_list(aList, bArg, operator.add)
     
 def add_list_elements(in_list):
     """
     Add list elements together, e.g. [1,2,3,4,5,6] -> 1+2+3+4+5+6=21
 
-    Note: Guido van Rossum prefers using list comprehension instead of reduce, lambda (https://www.python-course.eu).
+    Uses sum() for numbers and math.fsum() for a float sum to avoid loss of precision. Uses operator.add
+    for elements that sum() does not support, e.g. ['a','b'] -> 'ab'.
     """
-    return reduce(lambda x, y: x+y, in_list)
+    try:
+        s = sum(in_list)
+    except TypeError:
+        return functools.reduce(operator.add, in_list)
+    if isinstance(s, float):
+        return math.fsum(in_list)
+    return s
 
 def abs_list(in_list):
     """
     Return abs() of each element in in_list, e.g. [2, 3+4j, -6] -> [2, 5, 6]
+    
+    For a numpy array in_list the abs() is returned as numpy array.
     """
+    if isinstance(in_list, np.ndarray):
+        return np.abs(in_list)
     return [abs(x) for x in in_list]
 
 def is_complex_list(in_list):
     """
     Return True if at least one element in in_list is complex, else return False
+    
+    For a numpy array in_list only the dtype needs to be checked.
     """
-    isComplex = [isinstance(x, complex) for x in in_list]
-    if True in isComplex:
-        return True
-    else:
-        return False
+    if isinstance(in_list, np.ndarray):
+        return np.iscomplexobj(in_list)
+    return any(isinstance(x, complex) for x in in_list)
 
 def mean_list_elements(in_list):
     """
@@ -411,13 +670,24 @@ def std_list_elements(in_list, populationSet=True):
     When population is True divide by len(in_list) to get the standard deviation of a complete set,
     else divide by len(in_list)-1 to get the standard deviation for a sample of a set.
     
-    Note: this method is ok, but in general better use numpy.std()
-    """
-    m = mean_list_elements(in_list)
+    Note: this method is ok, but in general better use numpy.std(). For a numpy array in_list numpy.std()
+    is used. For a list the mean and the sum of squared differences are calculated in one pass using
+    Welford's algorithm.
+    """
+    if isinstance(in_list, np.ndarray):
+        return in_list.std(ddof=0 if populationSet else 1).item()
+    n = 0
+    m = 0.0
+    M2 = 0.0
+    for x in in_list:
+        n += 1
+        d = x - m
+        m += d / n
+        M2 += (d.conjugate() * (x - m)).real   # = abs(d)**2 * (n-1)/n, also for complex x
     if populationSet:
-        return math.sqrt(sum([abs(x-m)**2.0 for x in in_list]) / len(in_list))
+        return math.sqrt(M2 / n)
     else:
-        return math.sqrt(sum([abs(x-m)**2.0 for x in in_list]) / (len(in_list)-1))
+        return math.sqrt(M2 / (n-1))
 
 def rms_list_elements(in_list, populationSet=True):
     """
@@ -439,7 +709,7 @@ def pwr_list_elements(in_list, populationSet=True):
     else:
         return math.sqrt(sum([abs(x)**2.0 for x in in_list]) / (len(in_list)-1))
         
-def calculate_list_data_statistics(data_list):
+def calculate_list_data_statistics(data_list, dtype=None):
     """Calculate several single value statistics for the data in data_list
     
     Returns mean, std, rms, max abs, max and min of real part, max and min of imag part
@@ -447,23 +717,31 @@ def calculate_list_data_statistics(data_list):
     The data_list can be a list of:
     - real values that were read with read_data_buffer() and then converted to signed integers using to_signed().
     - complex values that were read with read_data_buffer() and then converted into complex data using unconcat_complex().
+    The data_list can also be a numpy array, e.g. of dtype complex128 for complex values, which avoids the
+    conversion of a list of Python complex objects.
+    
+    The dtype can be used to calculate the statistics with less precision, but also less memory traffic,
+    e.g. np.float32 for real data or np.complex64 for complex data. Default dtype=None keeps the dtype of
+    the data_list.
     
     For a real data list the max abs is max([max real, -min real])
     For a real data list the max and min of the imag part are 0.
     """
-    mean = mean_list_elements(data_list)
-    std = std_list_elements(data_list)
-    rms = rms_list_elements(data_list)
-    maxAbs = max(abs_list(data_list))
-    if is_complex_list(data_list):
-        realData, imagData = split_complex(data_list)
-        maxReal = max(realData)
-        minReal = min(realData)
-        maxImag = max(imagData)
-        minImag = min(imagData)
+    # Convert to numpy array once, so that each statistic is a numpy reduction instead of a Python list pass
+    a = np.asarray(data_list, dtype=dtype)
+    absA = np.abs(a)
+    mean = a.mean().item()
+    std = a.std().item()
+    rms = math.sqrt(np.mean(absA**2.0))
+    maxAbs = absA.max().item()
+    if np.iscomplexobj(a):
+        maxReal = a.real.max().item()
+        minReal = a.real.min().item()
+        maxImag = a.imag.max().item()
+        minImag = a.imag.min().item()
     else:
-        maxReal = max(data_list)
-        minReal = min(data_list)
+        maxReal = a.max().item()
+        minReal = a.min().item()
         maxImag = 0
         minImag = 0
     return mean, std, rms, maxAbs, maxReal, minReal, maxImag, minImag
@@ -472,45 +750,25 @@ def subtract_list(aList, bArg):
     """
     Element by element subract list b from list a or subract value b from each element in list a 
     """
-    aLen  = len(aList)
-    bList = listify(bArg)
-    if len(bList)==1:
-        bList = bList[0]*aLen   
-    s = []
-    for i in range(aLen):
-        s.append(aList[i] - bList[i])
-    return s
+    return _binop_list(aList, bArg, operator.sub)
     
 def multiply_list(aList, bArg):
     """
     Element by element multiply list b with list a or multiply value b with each element in list a 
     """
-    aLen  = len(aList)
-    bList = listify(bArg)
-    if len(bList)==1:
-        bList = bList[0]*aLen
-    s = []
-    for i in range(aLen):
-        s.append(aList[i] * bList[i])
-    return s
+    return _binop_list(aList, bArg, operator.mul)
     
 def multiply_list_elements(in_list):
     """
     Multiply list elements together, e.g. [1,2,3,4,5,6] -> 1*2*3*4*5*6=720.
     """
-    return reduce(lambda x, y: x*y, in_list)
+    return math.prod(in_list)
     
 def divide_list(aList, bArg):
     """
     Element by element divide list a by list b or divide each element in list a by value b
     """
-    aLen  = len(aList)
-    bList = listify(bArg)
-    if len(bList)==1:
-        bList = bList[0]*aLen
-    for i in range(aLen):
-        s.append(aList[i] / bList[i])   # assume float division
-    return s
+    return _binop_list(aList, bArg, operator.truediv)
     
 def split_list(source_list, split_size=None, sublist_items=None, nof_output_lists=None):
     """
@@ -642,13 +900,25 @@ def index_a_in_b(a, b, duplicates=False):
     Find the elements of list a in list b and return their indices (relative to b).
     Does not return duplicates by default.
     """
-    if duplicates==False:
-        return [i for i,item in enumerate(b) if item in a]
-    else:
-        hits = []
-        for item_in_a in a:
-            hits.append( [i for i,item in enumerate(b) if item == item_in_a] )
-        return flatten(hits)
+    try:
+        # Use set and dict lookups for hashable elements
+        if duplicates==False:
+            aSet = set(a)
+            return [i for i,item in enumerate(b) if item in aSet]
+        else:
+            bIndices = {}
+            for i,item in enumerate(b):
+                bIndices.setdefault(item, []).append(i)
+            return list(itertools.chain.from_iterable(bIndices.get(item_in_a, []) for item_in_a in a))
+    except TypeError:
+        # Unhashable elements, e.g. lists
+        if duplicates==False:
+            return [i for i,item in enumerate(b) if item in a]
+        else:
+            hits = []
+            for item_in_a in a:
+                hits.append( [i for i,item in enumerate(b) if item == item_in_a] )
+            return flatten(hits)
 
 def index_a_in_multi_b(a, b):
     """
@@ -670,12 +940,22 @@ def exist_all_elements_from_a_in_b(a, b):
        
        Both a and b can be a one dimensional list or a single object.
     """
-    for i in listify(a):
-        if i not in listify(b):
-            return False
-    return True
+    bList = listify(b)
+    try:
+        bSet = set(bList)   # use set lookup for hashable elements
+        return all(i in bSet for i in listify(a))
+    except TypeError:
+        return all(i in bList for i in listify(a))   # unhashable elements, e.g. lists
     
 
+# Numpy ufunc equivalents of the condition operators
+_operator_ufuncs = {operator.eq: np.equal,
+                    operator.ne: np.not_equal,
+                    operator.lt: np.less,
+                    operator.le: np.less_equal,
+                    operator.gt: np.greater,
+                    operator.ge: np.greater_equal}
+
 def find_indices_where(in_list, value, condition=operator.eq):
     """Return list of indices in in_list that match the condition value
     
@@ -686,7 +966,13 @@ def find_indices_where(in_list, value, condition=operator.eq):
          operator.le : <=
          operator.gt : >
          operator.ge : >=
+         
+       For numeric in_list and these condition operators the comparison is done by numpy.
     """
+    if condition in _operator_ufuncs and isinstance(value, c_numeric_types):
+        a = _numeric_array(in_list, 'biufc')
+        if a is not None:
+            return np.nonzero(_operator_ufuncs[condition](a, value))[0].tolist()
     return [i for i,x in enumerate(in_list) if condition(x, value)]
         
 def find_indices_where_eq(in_list, value): return find_indices_where(in_list, value, operator.eq)
@@ -701,13 +987,7 @@ def unique(in_list):
     """
     Extract unique list elements (without changing the order like set() does)
     """
-    seen = {}
-    result = []
-    for item in in_list:
-       if item in seen: continue
-       seen[item] = 1
-       result.append(item)
-    return result
+    return list(dict.fromkeys(in_list))   # dict keys preserve insertion order
     
 def reverse_list(in_list):
     """Return list in reversed index order"""
@@ -715,7 +995,11 @@ def reverse_list(in_list):
     
 def sort_list_indices(in_list, lowToHigh = True):
     """Return list of original indices of in_list for the sorted(in_list)"""
-    result = sorted(list(range(len(in_list))), key = lambda ix : in_list[ix])
+    a = _numeric_array(in_list, 'biuf')
+    if a is not None and not (a.dtype.kind == 'f' and np.isnan(a).any()):   # NaN order of sorted() differs from numpy
+        result = np.argsort(a, kind='stable').tolist()   # stable to keep same index order as sorted() for equal elements
+    else:
+        result = sorted(list(range(len(in_list))), key = lambda ix : in_list[ix])   # e.g. for list of tuples or strings
     if lowToHigh==True:
         return result
     else:
@@ -725,19 +1009,18 @@ def list_duplicates(in_list):
     """
     find duplicate list elements
     """
-    # http://stackoverflow.com/questions/9835762/find-and-list-duplicates-in-python-list
-    seen = set()
-    seen_add = seen.add
-    # adds all elements it doesn't know yet to seen and all other to seen_twice
-    seen_twice = set( x for x in in_list if x in seen or seen_add(x) )
-    # turn the set into a list (as requested)
-    return list( seen_twice )
+    return [x for x, count in collections.Counter(in_list).items() if count > 1]
 
 def all_the_same(lst):
     """
     Returns True if all the list elements are identical.
     """
-    return lst[1:] == lst[:-1]
+    if isinstance(lst, np.ndarray):
+        return lst.size == 0 or bool(np.all(lst == lst.flat[0]))
+    if len(lst) == 0:
+        return True
+    first = lst[0]
+    return all(x == first for x in lst)   # stops at first element that differs
 
 def all_equal_to(lst, value):
     """
@@ -751,8 +1034,15 @@ def all_equal_to(lst, value):
 def rotate_list(in_list, n):
     """
     Rotates the list. Positive numbers rotate left. Negative numbers rotate right.
-    """
-    return in_list[n:] + in_list[:n]  
+    
+    A list is rotated using collections.deque.rotate(), that rotates modulo len(in_list).
+    Other sequences, e.g. a string or tuple, are rotated using slicing.
+    """
+    if isinstance(in_list, list):
+        d = collections.deque(in_list)
+        d.rotate(-n)
+        return list(d)
+    return in_list[n:] + in_list[:n]
       
 def to_uword(arg):
     """
@@ -761,6 +1051,8 @@ def to_uword(arg):
       common.to_signed(common.to_uword(-1), 32) = -1
       
     """
+    if isinstance(arg, np.ndarray):
+        return to_unsigned_array(arg, c_word_w)
     vRet = []
     vList = listify(arg)
     for value in vList:
@@ -772,6 +1064,8 @@ def to_unsigned(arg, width):
     """
     Interpret value[width-1:0] as unsigned
     """
+    if isinstance(arg, np.ndarray):
+        return to_unsigned_array(arg, width)
     c_mask = 2**width-1
     vRet = []
     vList = listify(arg)
@@ -780,10 +1074,21 @@ def to_unsigned(arg, width):
         vRet.append(v)
     return unlistify(vRet)
 
+def to_unsigned_array(arr, width):
+    """
+    Interpret value[width-1:0] of all values in arr as unsigned, using numpy int64 so width must be < 64.
+    
+    Returns numpy array.
+    """
+    a = np.asarray(arr).astype(np.int64)   # also accept float values by converting to int
+    return a & ((1<<width)-1)
+
 def to_signed(arg, width):
     """
     Interpret arg value[width-1:0] or list of arg values as signed (two's complement)
     """
+    if isinstance(arg, np.ndarray):
+        return to_signed_array(arg, width)
     c_wrap = 2**width
     c_mask = 2**width-1
     c_sign = 2**(width-1)
@@ -795,6 +1100,16 @@ def to_signed(arg, width):
             v -= c_wrap           # keep negative values and wrap too large positive values
         vRet.append(v)
     return unlistify(vRet)
+
+def to_signed_array(arr, width):
+    """
+    Interpret value[width-1:0] of all values in arr as signed (two's complement), using numpy int64 so width must be < 64.
+    
+    Returns numpy array.
+    """
+    a = to_unsigned_array(arr, width)
+    c_sign = 1<<(width-1)
+    return np.where(a & c_sign, a - (1<<width), a)   # keep negative values and wrap too large positive values
   
 def max_abs(data):
     return max(max(data), -min(data))
@@ -813,6 +1128,11 @@ def deinterleave(input_stream, nof_out, block_size=1):
     Note: len(input_stream)/nof_out/block_size should yield an integer.
     Note: This method behaves exactly like common_deinterleave.vhd.
     """
+    # Numeric stream: block j of the stream goes to output j % nof_out, which is a reshape and transpose
+    a = np.asarray(input_stream)
+    if a.ndim == 1 and a.dtype.kind in 'biufc' and len(a) % (nof_out * block_size) == 0:
+        return a.reshape(-1, nof_out, block_size).transpose(1, 0, 2).reshape(nof_out, -1).tolist()
+
     # Check passed arguments:
     if ( float(len(input_stream))/nof_out/block_size%1==0):
         # Split the list into block_sized sublists:
@@ -824,7 +1144,7 @@ def deinterleave(input_stream, nof_out, block_size=1):
         # Split block_list into 2 sublists so we can transpose them
         sublist_size = nof_out
         block_2arr = split_list(block_list, sublist_size)
-        transposed = transpose(block_2arr)
+        transposed = [list(col) for col in zip(*block_2arr)]   # transpose only the two list dimensions, not the blocks
 
         # Flatten the list so we can re-split it:
         flat_out_list = flatten(transposed)
@@ -842,6 +1162,11 @@ def interleave(input_streams, block_size=1):
     Interleave a list of multiple lists into one based on block size. 
     Note: This method behaves exactly like common_interleave.vhd.
     """
+    # Numeric streams: take block k of every stream in turn via a reshape and transpose
+    a = np.asarray(input_streams)
+    if a.ndim == 2 and a.dtype.kind in 'biufc' and a.shape[1] % block_size == 0:
+        return a.reshape(a.shape[0], -1, block_size).transpose(1, 0, 2).reshape(-1).tolist()
+
     # flatten the list
     flat_list = flatten(input_streams)
 
@@ -861,6 +1186,18 @@ def reinterleave(input_streams, nof_out, block_size_in=1, block_size_out=1):
     """
     nof_in = len(input_streams)
 
+    # Numeric streams: the deinterleavers, interconnect and interleavers are reshapes and transposes
+    a = np.asarray(input_streams)
+    if a.ndim == 2 and a.dtype.kind in 'biufc':
+        stream_len = a.shape[1]
+        deint_len = stream_len // nof_out
+        if stream_len % (nof_out * block_size_in) == 0 and deint_len % block_size_out == 0:
+            # deint_arr: [nof_in][nof_out][deint_len]
+            deint_arr = a.reshape(nof_in, -1, nof_out, block_size_in).transpose(0, 2, 1, 3).reshape(nof_in, nof_out, deint_len)
+            # inter_in_arr: [nof_out][nof_in][deint_len], interleave the blocks of the nof_in streams per nof_out
+            inter_in_arr = deint_arr.transpose(1, 0, 2).reshape(nof_out, nof_in, -1, block_size_out)
+            return inter_in_arr.transpose(0, 2, 1, 3).reshape(nof_out, -1).tolist()
+
     # Array of deinterleavers:
     # ------------------------
     # deint_arr: [nof_in][deinterleaved streams]:
@@ -893,11 +1230,13 @@ def reverse_cols_lr(matrix):
         return np_matrix.fliplr().tolist()
     
     To suit any list element type use general fliplr.
+
+    For a numpy array matrix a view is returned, use .copy() if a separate
+    buffer is needed.
     """
-    result = []
-    for row in matrix:
-        result.append(list(reversed(row)))
-    return result
+    if isinstance(matrix, np.ndarray):
+        return matrix[:, ::-1]
+    return [row[::-1] if isinstance(row, list) else list(reversed(row)) for row in matrix]
         
 def reverse_rows_ud(matrix):
     """ Flip order of the rows in the matrix[row][col]
@@ -910,38 +1249,32 @@ def reverse_rows_ud(matrix):
     To suit any list element type use general flipud.
     
     This reverse_rows_ud() is equivalent to reverse_list(), because it affects the row index, that is the first index.
+
+    For a numpy array matrix a view is returned, use .copy() if a separate
+    buffer is needed.
     """
+    if isinstance(matrix, np.ndarray):
+        return matrix[::-1]
     return list(reversed(matrix))
 
 def transpose(matrix):
-    """ PD transpose using numpy """
+    """ PD transpose using numpy
+
+    For a numpy array matrix the transposed view matrix.T is returned, use
+    .copy() if a separate buffer is needed.
+    """
+    if isinstance(matrix, np.ndarray):
+        return matrix.T
     np_matrix = np.array(matrix)
     return np_matrix.transpose().tolist()
-    
-    """
-    Transpose by using zip()
-    """
-    result = []
-    transposed = list(zip(*matrix))
-    # Python's zip() returns a list of tuples. We do not want that as tuples
-    # should only be used to bind items together; methods like flatten()
-    # preserve tuples (as tuples should not be broken - that's why they're 
-    # tuples in the first place) wich would mean the output of a transpose 
-    # could not be flattened. So, convert the list of tuples to a list of lists:
-    for i in transposed:
-        result.append(list(i))
-    return result
 
 def straighten(matrix, padding=' '):
     """
     Straighten a crooked matrix by padding the shorter lists with the padding
     up to the same length as the longest list.
     """
-    padded_matrix = []
-    max_len = len(max(matrix))
-    for row in matrix:
-        padded_matrix.append(pad(row, max_len, padding))
-    return padded_matrix
+    max_len = max(map(len, matrix))   # longest row, max(matrix) would compare the rows themselves
+    return [row + [padding]*(max_len-len(row)) for row in matrix]   # = pad(row, max_len, padding) per row
  
 def pad(lst, length, padding=' '):
     """
@@ -952,14 +1285,30 @@ def pad(lst, length, padding=' '):
 def depth(x):
     """
     Returns the depth of x. Returns 0 if x is not iterable (not a list or tuple).
+    
+    The depth is determined by following the first element at each level, so for a ragged
+    x, e.g. [1, [2]], the depth of the first element path is returned.
     """
-    if isinstance(x, list) or isinstance(x, tuple):
-        for level in itertools.count():
-            if not x:
-                return level
-            x = list(itertools.chain.from_iterable(s for s in x if isinstance(s, list) or isinstance(s, tuple)))
-    else:
+    level = 0
+    while isinstance(x, (list, tuple)):
+        if not x:
+            return level
+        x = x[0]
+        level += 1
+    return level
+
+def _max_depth(x, limit):
+    """
+    Returns the maximum depth of x over all elements, like the depth of the deepest nesting, but stops at limit.
+    Returns 0 if x is not iterable (not a list or tuple).
+    """
+    if not isinstance(x, (list, tuple)):
         return 0
+    for level in range(limit):
+        if not x:
+            return level
+        x = [s for el in x if isinstance(el, (list, tuple)) for s in el]
+    return limit
 
 def listify(x):
     """
@@ -993,9 +1342,11 @@ def tuplefy(x):
     Non-flat tuples are returned untouched.
     A non-tuple (depth=0) is also pushed into a tuple 2 levels deep.
     """
-    if depth(x)==1:
+    # Use the maximum depth, because the first element of a tuple of inconsistent depth can be less deep
+    d = _max_depth(x, 2)
+    if d==1:
         return (x,)
-    elif depth(x)==0:
+    elif d==0:
        return ( (x,), )
     else:
         return x
@@ -1004,37 +1355,59 @@ def method_name(caller_depth=0):
     """
     Returns the name of the caller method.
     """
-    # Note: inspect.stack()[0][3] would return the name of this method.
-    return inspect.stack()[caller_depth+1][3]
+    # Note: sys._getframe(0) would return the frame of this method.
+    try:
+        return sys._getframe(caller_depth+1).f_code.co_name
+    except ValueError:
+        raise IndexError('method_name: caller_depth %d exceeds the call stack' % caller_depth)
+
+@functools.lru_cache(maxsize=256)
+def _method_arg_names(func):
+    return tuple(inspect.getfullargspec(func).args)
 
 def method_arg_names(method):
     """
     Returns the names of the arguments of passed method.
     """
-    return inspect.getargspec(method)[0]
+    # Cache on the underlying function, to not keep bound method instances alive. The getfullargspec()
+    # args of a bound method also include self.
+    func = getattr(method, '__func__', method)
+    try:
+        return list(_method_arg_names(func))
+    except TypeError:
+        return inspect.getfullargspec(method).args   # unhashable callable
     
 def concat_complex(list_complex, width_in_bits, imreOrder=True):
     """
     Concatenates the real and imaginary part into one integer. 
     The specifed width counts for both the real and imaginary part. 
     Real part is mapped on the LSB. Imaginary part is shifted to the MSB. 
-    """
+    For a numpy array list_complex the concatenation is done by numpy and returned
+    as numpy array of uint64, so then width_in_bits must be <= 32.
+    """
+    if isinstance(list_complex, np.ndarray):
+        if width_in_bits in c_concat_dtypes:
+            # Write the parts as adjacent words and view each pair as one double width word
+            word_dtype, pair_dtype = c_concat_dtypes[width_in_bits]
+            lsb = 0 if sys.byteorder == 'little' else 1
+            pair = np.empty(list_complex.shape + (2,), dtype=word_dtype)
+            pair[..., lsb if imreOrder else 1-lsb] = list_complex.real.astype(np.int64).astype(word_dtype)
+            pair[..., 1-lsb if imreOrder else lsb] = list_complex.imag.astype(np.int64).astype(word_dtype)
+            return pair.view(pair_dtype)[..., 0].astype(np.uint64, copy=False)
+        mask = (1<<width_in_bits)-1
+        real = (list_complex.real.astype(np.int64) & mask).astype(np.uint64)
+        imag = (list_complex.imag.astype(np.int64) & mask).astype(np.uint64)
+        if imreOrder:
+            return (imag << width_in_bits) | real
+        else:
+            return (real << width_in_bits) | imag
+
     # PD
+    mask = (1<<width_in_bits)-1
     if imreOrder:
-        return [((int(i.imag) & (2**width_in_bits-1)) << width_in_bits) + (int(i.real) & (2**width_in_bits-1)) for i in list_complex]
+        return [((int(i.imag) & mask) << width_in_bits) + (int(i.real) & mask) for i in list_complex]
     else:
-        return [((int(i.real) & (2**width_in_bits-1)) << width_in_bits) + (int(i.imag) & (2**width_in_bits-1)) for i in list_complex]
-    
-    # EK    
-    result = []    
-    for i in range(len(list_complex)):
-        real = int(list_complex[i].real) & (2**width_in_bits-1)
-        imag = int(list_complex[i].imag) & (2**width_in_bits-1)
-        if imreOrder:
-            result.append((imag << width_in_bits) + real)
-        else:
-            result.append((real << width_in_bits) + imag)
-    return result                                       
+        return [((int(i.real) & mask) << width_in_bits) + (int(i.imag) & mask) for i in list_complex]
 
 def unconcat_complex(list_concat, width_in_bits, imreOrder=True):
     """
@@ -1045,39 +1418,71 @@ def unconcat_complex(list_concat, width_in_bits, imreOrder=True):
     Example:
       >>> unconcat_complex(concat_complex([complex(1,2), complex(3,4)], 16), 16)
       [(1+2j), (3+4j)]
-    """
-    result = []    
-    for i in range(len(list_concat)):
-        lo = to_signed( list_concat[i]                   & (2**width_in_bits-1), width_in_bits)
-        hi = to_signed((list_concat[i] >> width_in_bits) & (2**width_in_bits-1), width_in_bits) 
+    For a numpy array list_concat the unconcatenation is done by numpy and returned
+    as numpy array of complex128.
+    """
+    if isinstance(list_concat, np.ndarray):
+        if width_in_bits in c_concat_dtypes:
+            # View each double width word as a pair of signed words, this also sign extends the parts
+            word_dtype, pair_dtype = c_concat_dtypes[width_in_bits]
+            lsb = 0 if sys.byteorder == 'little' else 1
+            pair = np.ascontiguousarray(list_concat.astype(pair_dtype)).view(word_dtype.replace('u', ''))
+            pair = pair.reshape(list_concat.shape + (2,))
+            lo = pair[..., lsb]
+            hi = pair[..., 1-lsb]
+        else:
+            mask = (1<<width_in_bits)-1
+            lo = to_signed_array(list_concat & mask, width_in_bits)
+            hi = to_signed_array((list_concat >> width_in_bits) & mask, width_in_bits)
+        result = np.empty(list_concat.shape, dtype=np.complex128)
         if imreOrder:
-            result.append(complex(lo, hi))
+            result.real = lo
+            result.imag = hi
         else:
-            result.append(complex(hi, lo))
-    return result                                       
+            result.real = hi
+            result.imag = lo
+        return result
+
+    mask = (1<<width_in_bits)-1
+    sign = 1<<(width_in_bits-1)
+    # (x ^ sign) - sign = to_signed(x, width_in_bits) for 0 <= x <= mask
+    if imreOrder:
+        return [complex(((x & mask) ^ sign) - sign, (((x >> width_in_bits) & mask) ^ sign) - sign) for x in list_concat]
+    else:
+        return [complex((((x >> width_in_bits) & mask) ^ sign) - sign, ((x & mask) ^ sign) - sign) for x in list_concat]
 
 def split_complex(list_complex):
     """
     Returns the real and imaginary part in two separate lists. 
     [list_re, list_im] = split_complex(list_complex)
+    For a numpy array list_complex the real and imaginary part are returned as numpy array views.
     """ 
-    list_real = []
-    list_imag = []
-    for i in range(len(list_complex)):
-        list_real.append(list_complex[i].real)
-        list_imag.append(list_complex[i].imag)
-    return (list_real, list_imag)
+    if isinstance(list_complex, np.ndarray):
+        return (list_complex.real, list_complex.imag)
+    a = np.asarray(list_complex)
+    return (a.real.tolist(), a.imag.tolist())
 
 def unsplit_complex(list_real, list_imag):
     """Returns complex list by combining the real and imaginary parts from two separate lists. 
+    
+    If list_real or list_imag is a numpy array, then a numpy array of complex128 is returned.
     """ 
-    return [complex(x,y) for x,y in zip(list_real, list_imag)]
+    re = np.asarray(list_real)
+    im = np.asarray(list_imag)
+    result = np.empty(re.shape, dtype=np.complex128)
+    result.real = re
+    result.imag = im
+    if isinstance(list_real, np.ndarray) or isinstance(list_imag, np.ndarray):
+        return result
+    return result.tolist()
 
 def mac_str(n):
     """
     Converts MAC address integer to the hexadecimal string representation,
     separated by ':'.
     """
+    if 0 <= n < 1<<48:
+        return '%02x:%02x:%02x:%02x:%02x:%02x' % tuple(int(n).to_bytes(6, 'big'))
     hexstr = "%012x" % n
     return ':'.join([hexstr[i:i+2] for i in range(0, len(hexstr), 2)])
 
@@ -1086,6 +1491,8 @@ def ip_str(n):
     Converts IP address integer to the decimal string representation,
     separated by '.'.
     """
+    if 0 <= n < 1<<32:
+        return '%d.%d.%d.%d' % tuple(int(n).to_bytes(4, 'big'))
     ip_bytes = CommonBytes(n, 4)
     return str(ip_bytes[3])+'.'+str(ip_bytes[2])+'.'+str(ip_bytes[1])+'.'+str(ip_bytes[0])
     
@@ -1111,9 +1518,14 @@ def expand_file_path_name(fpn, dir_path=''):
 def find_string_in_file(fpn, find_str):
     """Return index >= 0 if find_str is found in file fpn, returns -1 if find_str is not found in file fpn.
     
-       Can also find '\n'.
-    """
-    return open(fpn, 'r').read().find(find_str)
+       Can also find '\n'. The returned index is the byte offset of find_str in the UTF-8 encoded file.
+       The file is memory mapped, so it is searched without reading it into memory.
+    """
+    with open(fpn, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return -1   # an empty file cannot be memory mapped
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            return mm.find(find_str.encode())
     
 def remove_from_list_string(list_str, item_str, sep=' '):
     """Treat the string list_str as a list of items that are separated by sep and then
@@ -1131,25 +1543,83 @@ def find_all_file_paths(rootDir, fileName):
     Recursively search the rootDir tree to find the paths to all fileName files.
     """
     paths = []
-    for root, _, files in os.walk(rootDir):
-        if fileName in files:
-             paths.append(root)
+    dirs = [rootDir]
+    while dirs:
+        root = dirs.pop()
+        try:
+            with os.scandir(root) as it:
+                entries = list(it)
+        except OSError:
+            continue   # skip unreadable directories, like os.walk()
+        subDirs = []
+        for entry in entries:
+            # Use the cached directory entry type and, like os.walk(), do not descend into symlinked directories
+            if entry.is_dir():
+                if not entry.is_symlink():
+                    subDirs.append(entry.path)
+            elif entry.name == fileName:
+                paths.append(root)
+        # Visit the sub directories depth first in listing order, like os.walk()
+        dirs.extend(reversed(subDirs))
     return paths
 
 
+def _reverse_bits64(n):
+    """Reverse the order of the 64 bits in n, using shift-mask-or steps that work for int and for numpy uint64 array n"""
+    n = ((n >> 1) & 0x5555555555555555) | ((n & 0x5555555555555555) << 1)
+    n = ((n >> 2) & 0x3333333333333333) | ((n & 0x3333333333333333) << 2)
+    n = ((n >> 4) & 0x0F0F0F0F0F0F0F0F) | ((n & 0x0F0F0F0F0F0F0F0F) << 4)
+    n = ((n >> 8) & 0x00FF00FF00FF00FF) | ((n & 0x00FF00FF00FF00FF) << 8)
+    n = ((n >> 16) & 0x0000FFFF0000FFFF) | ((n & 0x0000FFFF0000FFFF) << 16)
+    n = (n >> 32) | ((n & 0x00000000FFFFFFFF) << 32)
+    return n
+
 def reverse_bits(num, nofBits):
     """Reverse the order of the number of bits in the number value, e.g. to perform a index bit flip for an FFT"""
+    if nofBits <= c_longword_w:
+        return _reverse_bits64(num & c_longword_mask) >> (c_longword_w - nofBits)
     result = 0
     for i in range(nofBits):
         result = (result << 1) + (num & 1)   # flip order of bits
         num >>= 1
     return result
+
+def reverse_bits_array(arr, nofBits):
+    """Reverse the order of the nofBits <= 64 bits in all values in arr, e.g. to create an index bit flip table for an FFT
+    
+    Returns numpy array of uint64.
+    """
+    a = np.asarray(arr, dtype=np.uint64)
+    return _reverse_bits64(a) >> (c_longword_w - nofBits)
     
 
 def invert_msbit(num, nofBits):
     """Invert the most significant bit of num, e.g. to perform an index fftshift()"""
     return (num & (2**nofBits-1)) ^ (2**(nofBits-1))  # first mask bits of num and then invert MSbit
     
+def parse_fields(data, field_widths):
+    """Extract the consecutive bit fields with field_widths from data, starting at the LSbit,
+       e.g. parse_fields(0xDEADBEEF, [16, 8, 8]) returns [0xBEEF, 0xAD, 0xDE].
+
+       This avoids creating a CommonBits object and slicing it per field. For a numpy array of
+       packed records the fields of all records are extracted at once and returned as numpy
+       array of uint64 with one column per field, then sum(field_widths) must be <= 64.
+    """
+    if isinstance(data, np.ndarray):
+        a = np.asarray(data, dtype=np.uint64)
+        result = np.empty(a.shape + (len(field_widths),), dtype=np.uint64)
+        shift = 0
+        for i, w in enumerate(field_widths):
+            result[..., i] = (a >> shift) & ((1<<w)-1)
+            shift += w
+        return result
+    result = []
+    shift = 0
+    for w in field_widths:
+        result.append((data >> shift) & ((1<<w)-1))
+        shift += w
+    return result
+
 
 ################################################################################
 # Classes
@@ -1212,23 +1682,20 @@ class CommonBits:
 
     def __getitem__(self, bitslice):
         if self.check_slice(bitslice)==0:
-            if type(bitslice)==type(slice(1,2,3)):
-                # Get a bitmask for the bit range passed via the bitslice
-                bitmask = self.bitmask(bitslice.start - bitslice.stop +1)
-                return int((self.data >> bitslice.stop) & bitmask)
-            if type(bitslice)==type(0):
+            if isinstance(bitslice, slice):
+                # Shift and mask the bit range passed via the bitslice
+                return int((self.data >> bitslice.stop) & self.bitmask(bitslice.start - bitslice.stop + 1))
+            if isinstance(bitslice, int):
                 # We only want one bit
-                bitmask = self.bitmask(1)
-                return int((self.data >> bitslice) & bitmask)
-            print(bitmask)
+                return int((self.data >> bitslice) & 1)
         else:
             print('CommonBits: Error: invalid slice range')
 
     def __setitem__(self, bitslice, value):
         if self.check_slice(bitslice)==0:
-            if type(bitslice)==type(slice(1,2,3)):
+            if isinstance(bitslice, slice):
                 # Get a bitmask for the bit range passed via the bitslice
-                bitmask = self.bitmask(bitslice.start - bitslice.stop +1)
+                bitmask = self.bitmask(bitslice.start - bitslice.stop + 1)
 
                 if value==-1:
                     # Allow -1 to set range to all ones. Simply use the bitmask as data.
@@ -1238,19 +1705,18 @@ class CommonBits:
                 else:
                     print(("CommonBits: Error: Input data = %d. Only unsigned integers are supported, use to_unsigned(data, bits)." %value))
               
-                # Make sure bit length of passed data does not exceed bitmask length
-                if self.get_bin_len(data) <= self.get_bin_len(bitmask):
+                # Make sure passed data does not exceed bitmask
+                if data <= bitmask:
                     self.data = (self.data & ~(bitmask << bitslice.stop)) | (data << bitslice.stop)
                 else:
                     print(('CommonBits: Error: passed value (%d) does not fit in bits [%d..%d].' %(value, bitslice.start, bitslice.stop)))
 
-            if type(bitslice)==type(0):
+            if isinstance(bitslice, int):
                 # We only want to set one bit
-                bitmask = self.bitmask(1)
                 data=value
-                # Make sure bit length of passed data does not exceed bitmask length
-                if self.get_bin_len(data) <= self.get_bin_len(bitmask):
-                    self.data = (self.data & ~(bitmask << bitslice)) | (data << bitslice)   
+                # Make sure passed data is a single bit
+                if 0 <= data <= 1:
+                    self.data = (self.data & ~(1 << bitslice)) | (data << bitslice)
                 else:
                     print(('CommonBits: Error: passed value (%d) does not fit in bit [%d].' %(value, bitslice)))
 
@@ -1290,24 +1756,23 @@ class CommonBits:
         return ret 
 
     def hi(self):
-        data_bits = CommonBits(self.data)
+        # Visit only the set bits, by clearing the lowest set bit per step
+        n = self.data & ((1 << self.data_bin_len) - 1)
         result = []
-        for bit in range(0, self.data_bin_len):
-            if data_bits[bit]==1:
-                result.append(bit)
+        while n:
+            result.append((n & -n).bit_length() - 1)
+            n &= n - 1
         return result
 
     def lo(self):
-        data_bits = CommonBits(self.data)
-        result = []
-        for bit in range(0, self.data_bin_len):
-            if data_bits[bit]==0:
-                result.append(bit)
-        return result
+        n = self.data
+        return [bit for bit in range(self.data_bin_len) if not (n >> bit) & 1]
 
     def bitmask(self, nof_bits):
         # return a bitmask of nof_bits, e.g. 7 is a bitmask for 3 bits
-        return pow(2, nof_bits)-1
+        if nof_bits < len(c_bitmasks):
+            return c_bitmasks[nof_bits]
+        return (1 << nof_bits)-1
 
     def check_slice(self, bitslice):
         # Check that the user passed a valid slice e.g. [31:24], or 1 integer e.g. [31]
@@ -1333,12 +1798,15 @@ class CommonBits:
         return result
 
     def get_bin_len(self, value):
-        value_bin_str = bin(value)
-        # Cut the '0b' from the binary string:
-        value_bin = value_bin_str[2:len(value_bin_str)]
-        return len(value_bin)
+        # Length of bin(value) without the '0b', so 1 for value 0 and one extra for the '-' of a negative value
+        value_bin_len = int(value).bit_length()
+        if value < 0:
+            return value_bin_len + 1
+        return max(1, value_bin_len)
 
     def reversed(self):
+        if self.data.bit_length() <= self.data_bin_len <= c_longword_w:
+            return _reverse_bits64(self.data) >> (c_longword_w - self.data_bin_len)
         format_str = '{:0%db}'%self.data_bin_len
         res = int(format_str.format(self.data)[::-1], 2)
         return res
@@ -28,6 +28,8 @@
   . message text             : argument msgString, the actual text to log
 * All append_log statements that have verbosity level equal or lower than the
   test case verbosity level will get logged.
+* Use is_enabled(vLevel) to skip also the preparation of the log arguments
+  when the verbosity level is not logged.
 * The logging gets output to the stdio and to a file if a file name is provided.
 * It is also possible to append other files to the test logging file.
 * Best practise is to use the following verbosity levels for the append_log
@@ -46,7 +48,13 @@
 ################################################################################
 # System imports
 import sys
+import os
 import time
+import queue
+import threading
+import atexit
+import shutil
+import numpy as np
 import common as cm
 
 ################################################################################
@@ -64,99 +72,209 @@ class Testlog:
     V_DEBUG_DETAILS = 7
 
     _logName=None
+    _logEncoding='utf-8'
+    _logQueue=None
 
-    def __init__(self, verbosity=11, testId='', sectionId='', logName=None):
+    # Verbosity level prefix strings for append_log
+    _vLevelStrs = {v: ' - (%d) ' % v for v in range(V_DEBUG_DETAILS+1)}
+
+    def __init__(self, verbosity=11, testId='', sectionId='', logName=None, asyncMode=False):
         self.verbosity = verbosity                 # Verbosity threshold used by append_log() to decide whether to log the input string or not
         self._testId = testId                      # Test ID that optionally gets used as prefix in append_log line
         self._sectionId = sectionId                # Section ID that optionally gets used as prefix in append_log line
+        self._idStr = testId + sectionId           # Test ID and section ID prefix, for append_log lines that use both
         self._logName = logName                    # Name for the file that will contain the append_log 
+        self._timeSec = -1                         # Second of the last logged time stamp
+        self._timeStr = ''                         # Time stamp prefix string for self._timeSec, reused for all append_log lines in that second
         if self._logName != None:
             try:
-                self._logFile = open(self._logName,'w')
+                # Binary file with large buffer to write many log lines per system call, the log text is encoded by
+                # the append_log methods, so without the text file layer
+                self._logFile = open(self._logName, 'wb', buffering=65536)
             except IOError:
                 print('ERROR : Can not open log file %s' % self._logName)
+        if asyncMode:
+            # Let a background thread write the log lines to stdout and the log file, so append_log only
+            # has to queue the line. The queued lines are written at close_log() or at exit at the latest.
+            self._logQueue = queue.Queue(maxsize=10000)
+            self._logThread = threading.Thread(target=self._write_log_queue, daemon=True)
+            self._logThread.start()
+            atexit.register(self.close_log)
                 
     def __del__(self):
         if self._logName != None:
             self.close_log()
       
     def close_log(self):
-        if self._logName != None:
+        if self._logQueue != None:
+            # Write the remaining queued log lines and stop the background thread
+            self._logQueue.put(None)
+            self._logThread.join()
+            self._logQueue = None
+            atexit.unregister(self.close_log)
+        if self._logName != None and not self._logFile.closed:
+            self._logFile.flush()
             self._logFile.close()
     
     # The testId can should remain fixed at __init__, but the user can change the sectionId during the execution
     def set_section_id(self, sectionId):
         self._sectionId = sectionId
+        self._idStr = self._testId + sectionId
         
     def verbose_levels(self):
         return "0=result; 1=title; 2=errors; 3=info; 4=error details; 5=info details; 6=debug; 7=debug details"
 
+    # Return True when append_log statements with vLevel get logged. Use this at the call site to also skip
+    # preparing the log arguments, e.g. for debug data:
+    #   if tl.is_enabled(tl.V_DEBUG): tl.append_log_data(tl.V_DEBUG, '', expensive_data())
+    def is_enabled(self, vLevel):
+        return vLevel <= self.verbosity
+
+    # Format the time stamp prefix for the second now
+    def _set_time_str(self, now):
+        t = time.localtime(now)
+        self._timeStr = '[%d:%02d:%02d %02d:%02d:%02d]' % (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
+        self._timeSec = now
+
+    # Return the Testlog style prefix for an append_log line
+    def _log_prefix(self, vLevel, noTime=0, noVLevel=0, noTestId=0, noSectionId=0):
+        txt = ''
+        if noTime == 0:
+            now = int(time.time())
+            if now != self._timeSec:
+                self._set_time_str(now)
+            txt = txt + self._timeStr
+        if noVLevel == 0:
+            txt = txt + (self._vLevelStrs.get(vLevel) or ' - (%d) ' % vLevel)
+        if noTestId == 0 and noSectionId == 0:
+            txt = txt + self._idStr
+        elif noTestId == 0:
+            txt = txt + self._testId
+        elif noSectionId == 0:
+            txt = txt + self._sectionId
+        return txt
+
     # Print the message string and append it to the test log file in the Testlog style
     def append_log(self, vLevel, msgString, noTime=0, noVLevel=0, noTestId=0, noSectionId=0):
         if vLevel <= self.verbosity:
-            txt = ''
-            if noTime == 0:
-                t = time.localtime()
-                txt = txt + '[%d:%02d:%02d %02d:%02d:%02d]' % (t.tm_year, t.tm_mon, t.tm_mday, t.tm_hour, t.tm_min, t.tm_sec)
-            if noVLevel == 0:
-                txt = txt + ' - (%d) ' % vLevel
-            if noTestId == 0:
-                txt = txt + self._testId
-            if noSectionId == 0:
-                txt = txt + self._sectionId
-            txt = txt + msgString
-            print(txt)
-            #sys.stdout.flush()
-            if self._logName != None:
-                self._logFile.write(txt + '\n')
+            if noTime or noVLevel or noTestId or noSectionId:
+                self._write_log(self._log_prefix(vLevel, noTime, noVLevel, noTestId, noSectionId) + msgString)
+            else:
+                # Default full prefix, same as self._log_prefix(vLevel) but without the per flag checks
+                now = int(time.time())
+                if now != self._timeSec:
+                    self._set_time_str(now)
+                self._write_log(self._timeStr + (self._vLevelStrs.get(vLevel) or ' - (%d) ' % vLevel) + self._idStr + msgString)
+
+    # Print the message strings in the list lines and append them to the test log file in the Testlog style,
+    # like append_log per line, but with one prefix for all lines and one print and file write for the block
+    def append_log_block(self, vLevel, lines, noTime=0, noVLevel=0, noTestId=0, noSectionId=0):
+        if vLevel <= self.verbosity and len(lines) > 0:
+            prefix = self._log_prefix(vLevel, noTime, noVLevel, noTestId, noSectionId)
+            self._write_log(prefix + ('\n' + prefix).join(lines))   # prefix every line without creating a string per line
+
+    # Print the log text and append it to the test log file, or queue it for the background thread in asyncMode
+    def _write_log(self, txt):
+        if self._logQueue != None:
+            self._logQueue.put(txt)
+            return
+        stdout = sys.stdout   # look up per call to follow redirection of sys.stdout
+        stdout.write(txt)
+        stdout.write('\n')
+        #sys.stdout.flush()
+        if self._logName != None:
+            self._logFile.writelines((txt.encode(self._logEncoding), b'\n'))   # avoid creating the txt + newline string
+
+    # Background thread for asyncMode, writes the queued log texts until close_log() queues None
+    def _write_log_queue(self):
+        logQueue = self._logQueue
+        while True:
+            txts = [logQueue.get()]
+            # Write up to 64 queued log texts per stdout and log file write
+            while len(txts) < 64 and txts[-1] != None:
+                try:
+                    txts.append(logQueue.get_nowait())
+                except queue.Empty:
+                    break
+            stop = txts[-1] == None
+            if stop:
+                txts.pop()
+            if len(txts) > 0:
+                if self._logName != None:
+                    self._writev_log_file(txts)
+                txts.append('')   # end with newline
+                sys.stdout.write('\n'.join(txts))
+            if stop:
+                return
+
+    # Write the log texts of a batch from the background thread to the log file with one os.writev() system
+    # call, instead of passing them through the file buffer. In asyncMode only the background thread
+    # writes the log file, so the file object has no pending buffered data.
+    def _writev_log_file(self, txts):
+        encoding = self._logEncoding
+        if not hasattr(os, 'writev'):
+            self._logFile.write(('\n'.join(txts) + '\n').encode(encoding))
+            return
+        bufs = []
+        for txt in txts:
+            bufs.append(txt.encode(encoding))
+            bufs.append(b'\n')
+        fd = self._logFile.fileno()
+        nofBytes = os.writev(fd, bufs)
+        if nofBytes < sum(map(len, bufs)):
+            # Write the remainder after a partial write
+            rest = b''.join(bufs)[nofBytes:]
+            while rest:
+                rest = rest[os.write(fd, rest):]
     
     # Print the repeat message string at regular intervals and append it to the test log file in the Testlog style
     def append_log_rep(self, vLevel, rep, nofRep, nofLog=5, noTime=0, noVLevel=0, noTestId=0, noSectionId=0):
+        if self.V_INFO <= self.verbosity:
+            self.append_log_rep_check(rep, self.append_log_rep_interval(nofRep, nofLog), nofRep)
+
+    # Return the repeat log interval for append_log_rep_check(), to calculate it only once before a repeat loop
+    def append_log_rep_interval(self, nofRep, nofLog=5):
         if nofRep < nofLog:
-            logInterval = 1
-        else:
-            logInterval = nofRep//nofLog
+            return 1
+        return nofRep//nofLog
+
+    # Print the repeat message string if rep is at the logInterval from append_log_rep_interval() or rep is the last
+    def append_log_rep_check(self, rep, logInterval, nofRep):
         if rep%logInterval==0 or rep==nofRep-1:
-            self.append_log(3, 'Rep-%d' % rep)
+            self.append_log(self.V_INFO, 'Rep-%d' % rep)
 
 
     # Print the contents of an array to the test log file
     def append_log_data(self, vLevel, prefixStr, data, radix='dec', dataWidth=8, nofColumns=16, rulers=False, noTime=0, noVLevel=0, noTestId=0, noSectionId=0):
         if vLevel <= self.verbosity:
-            r = 0
+            lines = []
             columnWidth = dataWidth + 1  # use 1 space between columns
             if rulers:
-                rowStr = 'Col:'
-                for i in range(nofColumns):
-                    rowStr += '%*d' % (columnWidth, i)
-                self.append_log(vLevel, prefixStr + rowStr, noTime, noVLevel, noTestId, noSectionId)
-                self.append_log(vLevel, prefixStr + 'Row:', noTime, noVLevel, noTestId, noSectionId)
-                rowStr = prefixStr + ('%-4d' % r)
-            else:
-                rowStr = prefixStr
-                
-            k = 0
+                rowStr = 'Col:' + ''.join(['%*d' % (columnWidth, i) for i in range(nofColumns)])
+                lines.append(prefixStr + rowStr)
+                lines.append(prefixStr + 'Row:')
+
+            # Convert a numpy array once to a list of Python numbers, these format faster than numpy scalars
+            if isinstance(data, np.ndarray):
+                data = data.ravel().tolist()
 
             # Make sure data is a list, otherwise the following fails
-            if cm.depth(data)==0:
-                data=cm.listify(data)
+            if not isinstance(data, (list, tuple)):
+                data = [data]
 
+            # Select the data format with dataWidth once and then format the data per row of nofColumns
+            dataFmt = {'uns': ' %%%dd', 'dec': ' %%%dd', 'hex': ' %%0%dx'}.get(radix)
+            if dataFmt:
+                dataFmt = dataFmt % dataWidth
             n = len(data)
-            for i in range(n):
-                if radix=='uns': rowStr += ' %*d' % (dataWidth, data[i])
-                if radix=='dec': rowStr += ' %*d' % (dataWidth, data[i])
-                if radix=='hex': rowStr += ' %0*x' % (dataWidth, data[i])
-                if k < nofColumns-1:
-                    k = k + 1
-                else:
-                    self.append_log(vLevel, prefixStr + rowStr, noTime, noVLevel, noTestId, noSectionId)
-                    rowStr = prefixStr
-                    r = r + 1
-                    if rulers:
-                        rowStr += ('%-4d' % r)
-                    k = 0
-            if k!=0:
-                self.append_log(vLevel, prefixStr + rowStr, noTime, noVLevel, noTestId, noSectionId)
+            for r, i in enumerate(range(0, n, nofColumns)):
+                rowStr = prefixStr   # the row line starts with the prefixStr, like the rulers lines
+                if rulers:
+                    rowStr += ('%-4d' % r)
+                if dataFmt:
+                    rowStr += ''.join(map(dataFmt.__mod__, data[i:i+nofColumns]))
+                lines.append(rowStr)
+            self.append_log_block(vLevel, lines, noTime, noVLevel, noTestId, noSectionId)
         
     
     def data_to_string(self, data, dataWidth=4, dataLeft=False, fractionWidth=2, fractionExponent=False):
@@ -201,7 +319,31 @@ class Testlog:
         else:
             dataStr = '%*s ' % (dataWidth, dataStr)
         return dataStr
-                
+
+    def data_formatter(self, sample, dataWidth=4, dataLeft=False, fractionWidth=2, fractionExponent=False):
+        """Return function that prints data to string like self.data_to_string(), with the format selected once
+
+        The format strings are selected for the type of the sample data, e.g. the first element of a list
+        row, so that they do not need to be selected again for every element. Data of another type than
+        the sample data is printed by self.data_to_string().
+        """
+        sampleType = type(sample)
+        alignFmt = ('%%-%ds ' if dataLeft else '%%%ds ') % dataWidth
+        if isinstance(sample, float):
+            valueFmt = ('%%-%d.%d%s ' if dataLeft else '%%%d.%d%s ') % (dataWidth, fractionWidth, 'e' if fractionExponent else 'f')
+            sampleFormatter = lambda data: valueFmt % data
+        elif isinstance(sample, complex):
+            partFmt = '%%.%d%s' % (fractionWidth, 'e' if fractionExponent else 'f')
+            complexFmt = partFmt + ',' + partFmt + 'j'
+            sampleFormatter = lambda data: alignFmt % (complexFmt % (data.real, data.imag))
+        else:
+            sampleFormatter = lambda data: alignFmt % str(data)
+
+        def formatter(data):
+            if type(data) is sampleType:
+                return sampleFormatter(data)
+            return self.data_to_string(data, dataWidth, dataLeft, fractionWidth, fractionExponent)
+        return formatter
         
     def append_log_one_dimensional_list(self, vLevel, name, L, prefixStr='', dataWidth=4, dataLeft=False, fractionWidth=0, fractionExponent=False, colIndices=None):
         """Log list L[col] in one row with index labels
@@ -221,26 +363,25 @@ class Testlog:
         . This append_log_one_dimensional_list is similar to append_log_two_dimensional_list with 1 row.
         """
         if vLevel <= self.verbosity:
-            self.append_log(vLevel, '')   # start with newline
-            self.append_log(vLevel, prefixStr + '%s:' % name)
+            lines = ['']   # start with newline
+            lines.append(prefixStr + '%s:' % name)
             nof_cols = len(L)
             # Print row with column indices
             if colIndices == None:
                 colIndices = list(range(nof_cols))
-            col_index_str = '. index : '
-            for col in colIndices:
-                col_index_str += '%*d ' % (dataWidth, col)
-            self.append_log(vLevel, prefixStr + col_index_str)
+            col_index_str = '. index : ' + ''.join(['%*d ' % (dataWidth, col) for col in colIndices])
+            lines.append(prefixStr + col_index_str)
             # Print row with data
             line_str = '. value : '
             uniqueL = cm.unique(L)
             if len(uniqueL)==1:
                 line_str += 'all ' + self.data_to_string(uniqueL[0], dataWidth, dataLeft, fractionWidth, fractionExponent)
             else:
-                for col in range(nof_cols):
-                    line_str += self.data_to_string(L[col], dataWidth, dataLeft, fractionWidth, fractionExponent)
-            self.append_log(vLevel, prefixStr + '%s' % line_str)
-            self.append_log(vLevel, '')   # end with newline
+                formatter = self.data_formatter(L[0], dataWidth, dataLeft, fractionWidth, fractionExponent)
+                line_str += ''.join([formatter(L[col]) for col in range(nof_cols)])
+            lines.append(prefixStr + '%s' % line_str)
+            lines.append('')   # end with newline
+            self.append_log_block(vLevel, lines)
         
 
     def append_log_two_dimensional_list(self, vLevel, name, A, prefixStr='', transpose=False, reverseCols=False, reverseRows=False,
@@ -268,18 +409,18 @@ class Testlog:
           or use cm.create_multidimensional_list([Number of rows][Number of cols])
         """
         if vLevel <= self.verbosity:
-            self.append_log(vLevel, '')   # start with newline
-            self.append_log(vLevel, prefixStr + '%s:' % name)
+            lines = ['']   # start with newline
+            lines.append(prefixStr + '%s:' % name)
+            # Index A in the logged row and column order, instead of making transposed and reversed copies of A
             if transpose:
-                #print name, transpose
-                A = cm.transpose(A)
-            if reverseRows:
-                A = cm.reverse_rows_ud(A)
-            if reverseCols:
-                A = cm.reverse_cols_lr(A)
-            nof_rows = len(A)
-            nof_cols = len(A[0])
-            self.append_log(vLevel, prefixStr + 'col :')
+                nof_rows = len(A[0])
+                nof_cols = len(A)
+            else:
+                nof_rows = len(A)
+                nof_cols = len(A[0])
+            rowOrder = range(nof_rows-1, -1, -1) if reverseRows else range(nof_rows)
+            colOrder = range(nof_cols-1, -1, -1) if reverseCols else range(nof_cols)
+            lines.append(prefixStr + 'col :')
             # Print row with column indices
             if colIndices == None:
                 colIndices = list(range(nof_cols))
@@ -288,29 +429,48 @@ class Testlog:
                 rowIndexLength = 6                          # default row_str prefix length
             else:
                 rowIndexLength = 3 + len(str(rowIndices[-1]))  # use last row index string for row_str prefix length
-            col_index_str = ' ' * rowIndexLength
-            for col in colIndices:
-                col_index_str += '%*d ' % (dataWidth, col)
-            self.append_log(vLevel, prefixStr + col_index_str)
-            self.append_log(vLevel, prefixStr + 'row :')
+            col_index_str = ' ' * rowIndexLength + ''.join(['%*d ' % (dataWidth, col) for col in colIndices])
+            lines.append(prefixStr + col_index_str)
+            lines.append(prefixStr + 'row :')
             # For each row print row index and row with data
-            for ri,row in enumerate(rowIndices):
-                row_str = '%3s : ' % row   # row index, log index as string to support also text index
-                uniqueRow = cm.unique(A[ri])
+            row_prefixes = [prefixStr + '%3s : ' % row for row in rowIndices]   # row index, log index as string to support also text index
+            for ri,row_str in enumerate(row_prefixes):
+                r = rowOrder[ri]
+                if transpose:
+                    rowData = [A[c][r] for c in colOrder]
+                elif reverseCols:
+                    rowData = [A[r][c] for c in colOrder]
+                else:
+                    rowData = A[r]
+                uniqueRow = cm.unique(rowData)
                 if len(uniqueRow)==1:
                     row_str += 'all ' + self.data_to_string(uniqueRow[0], dataWidth, dataLeft, fractionWidth, fractionExponent)
                 else:
-                    for col in range(nof_cols):
-                        row_str += self.data_to_string(A[ri][col], dataWidth, dataLeft, fractionWidth, fractionExponent)
-                self.append_log(vLevel, prefixStr + '%s' % row_str)
-            self.append_log(vLevel, '')  # end with newline
+                    formatter = self.data_formatter(rowData[0], dataWidth, dataLeft, fractionWidth, fractionExponent)
+                    row_str += ''.join([formatter(rowData[col]) for col in range(nof_cols)])
+                lines.append(row_str)
+            lines.append('')  # end with newline
+            self.append_log_block(vLevel, lines)
 
 
     # Read the contents of a file and append that to the test log file
     def append_log_file(self, vLevel, fileName):
-        try:
-            appFile = open(fileName,'r')
-            self.append_log(vLevel,appFile.read(),1,1,1,1)
-            appFile.close()
-        except IOError:
-            self.append_log(vLevel,'ERROR : Can not open file %s' % fileName)
+        if vLevel <= self.verbosity:
+            try:
+                appFile = open(fileName,'r')
+            except IOError:
+                self.append_log(vLevel,'ERROR : Can not open file %s' % fileName)
+                return
+            with appFile:
+                if self._logQueue != None:
+                    self._write_log(appFile.read())   # queue the file contents to keep the order of the log lines
+                else:
+                    # Copy the file contents in chunks, instead of reading the whole file into memory
+                    stdout = sys.stdout
+                    shutil.copyfileobj(appFile, stdout, 65536)
+                    stdout.write('\n')
+                    if self._logName != None:
+                        # Copy the file bytes to the binary log file, without decoding and encoding them
+                        with open(fileName, 'rb') as appBinFile:
+                            shutil.copyfileobj(appBinFile, self._logFile, 65536)
+                        self._logFile.write(b'\n')
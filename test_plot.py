@@ -25,45 +25,192 @@
 
 ################################################################################
 # System imports
+import functools
+import queue
+import threading
+import atexit
 import numpy as np
-import matplotlib
-matplotlib.use('tkagg')
-import matplotlib.pyplot as plt
-from mpl_toolkits.axes_grid1 import make_axes_locatable
-import common as cm
+
+plt = None                    # matplotlib.pyplot, imported on first use by _import_matplotlib()
+make_axes_locatable = None    # mpl_toolkits.axes_grid1.make_axes_locatable, imported on first use by _import_matplotlib()
 
 ################################################################################
 # Functions
 
+def _import_matplotlib(backend='tkagg'):
+    """Import matplotlib on first use, because importing pyplot is slow and not needed by scripts that do not plot
+    
+    The backend is only selected by the first import.
+    """
+    global plt, make_axes_locatable
+    if plt is None:
+        import matplotlib
+        matplotlib.use(backend)
+        import matplotlib.pyplot
+        from mpl_toolkits.axes_grid1 import make_axes_locatable as axes_locatable
+        make_axes_locatable = axes_locatable
+        plt = matplotlib.pyplot
+
+c_represent_block_len = 8192   # number of elements per cache sized block in _magnitude_db()
+
+def _magnitude_db(arr, offset, scale, dtype=None):
+    """Return scale*log10(|arr| + offset).
+    
+    The arr is processed in cache sized blocks, so each element is read from memory only once and the offset, log10
+    and scale steps run in place on a block of |arr| that is still in cache. When dtype is not None, then the result is
+    written in that dtype by the last step, instead of converting the whole result afterwards.
+    """
+    # Use the memory order of arr, so that a transposed arr can also be processed as a flat view without a copy
+    order = 'F' if arr.flags.f_contiguous and not arr.flags.c_contiguous else 'C'
+    workType = arr.real.dtype if np.issubdtype(arr.dtype, np.inexact) else np.dtype(np.float64)
+    if dtype is None:
+        dtype = workType
+    buf = np.empty(arr.shape, dtype=dtype, order=order)
+    src = arr.reshape(-1, order=order)
+    dst = buf.reshape(-1, order=order)
+    tmp = None if buf.dtype == workType else np.empty(min(src.size, c_represent_block_len), dtype=workType)
+    for bi in range(0, src.size, c_represent_block_len):
+        blk = dst[bi:bi + c_represent_block_len]
+        work = blk if tmp is None else tmp[:blk.size]
+        # For complex arr np.abs() is a single pass, which is faster than re*re + im*im on the strided .real and .imag
+        # views, so using scale/2*log10(|arr|**2) to avoid the sqrt does not pay off
+        np.abs(src[bi:bi + c_represent_block_len], out=work)
+        if offset != 0:
+            np.add(work, offset, out=work)
+        np.log10(work, out=work)
+        np.multiply(work, scale, out=blk)
+    return buf
+
+c_image_max_pixels = 2000000   # block average larger images in _imshow_with_colorbar() ...
+c_image_max_dim = 2000         # ... to at most c_image_max_dim pixels per axis
+
+def _downsample_image(A, extent):
+    """Return (A, extent, limits) with two dimensional A block averaged when it has more than c_image_max_pixels.
+    
+    The image pixels are much smaller than the display pixels for a huge A, so imshow would only spend time to transfer
+    pixels that cannot be seen. Therefore average k x k blocks to get at most c_image_max_dim pixels per axis. A is
+    padded by repeating its last row and column to a multiple of k. The extent is scaled to the padded size and limits
+    returns the original (xlim, ylim) axes ranges of A, or None when A is not downsampled.
+    """
+    if A.ndim != 2 or A.size <= c_image_max_pixels:
+        return A, extent, None
+    H, W = A.shape
+    k = -(-max(H, W) // c_image_max_dim)   # ceil
+    Hp = -(-H // k) * k
+    Wp = -(-W // k) * k
+    if Hp != H or Wp != W:
+        A = np.pad(A, ((0, Hp - H), (0, Wp - W)), mode='edge')
+    A = A.reshape(Hp // k, k, Wp // k, k).mean(axis=(1, 3))
+    if extent is None:
+        extent = [-0.5, W - 0.5, -0.5, H - 0.5]   # = default imshow extent, to show the index ranges of A
+    left, right, bottom, top = extent
+    limits = ((left, right), (bottom, top))
+    extent = [left, left + (right - left) * Wp / W, bottom, bottom + (top - bottom) * Hp / H]
+    return A, extent, limits
+
+c_image_float32_steps = 2**16   # minimum number of float32 steps in the value range of an image in _image_float32()
+
+def _image_float32(A):
+    """Return float64 A as float32 when float32 still resolves the value range of A, else return A.
+    
+    imshow quantizes to the colormap anyway, so float32 halves the bytes to normalize. However for a small value range
+    at a large offset, e.g. 1e9 + np.arange(100.), the float32 steps are too coarse and would merge different values.
+    """
+    if A.dtype != np.float64 or A.size == 0:
+        return A
+    lo = A.min()
+    hi = A.max()
+    if np.spacing(np.float32(max(abs(lo), abs(hi)))) * c_image_float32_steps <= hi - lo:   # False for NaN or inf
+        return A.astype(np.float32)
+    return A
+
+# Data representations for Testplot._represent_array(), offset and dtype are only used by the dB* representations
+c_representations = {
+    'dB':     lambda arr, offset, dtype: _magnitude_db(arr, offset, 10, dtype),
+    'dBvolt': lambda arr, offset, dtype: _magnitude_db(arr, offset, 20, dtype),
+    'real':   lambda arr, offset, dtype: arr.real,
+    'imag':   lambda arr, offset, dtype: arr.imag,
+    'abs':    lambda arr, offset, dtype: np.abs(arr),
+    'rad':    lambda arr, offset, dtype: np.angle(arr),
+    'deg':    lambda arr, offset, dtype: np.angle(arr, deg=True)
+}
+
+def _draw_task(method):
+    """Decorator that queues the Testplot method call for the draw thread in asyncMode, else calls it directly
+    
+    The method call imports matplotlib on first use.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if self._drawQueue is None or threading.current_thread() is self._drawThread:
+            _import_matplotlib()
+            return method(self, *args, **kwargs)
+        self._drawQueue.put((method, args, kwargs))
+    return wrapper
+
+
 class Testplot:
   
-    def __init__(self, verbosity=11):
+    def __init__(self, verbosity=11, asyncMode=False):
+        """Testplot
+        
+        . verbosity = verbosity threshold used to decide whether to show the plot or not
+        . asyncMode = when True then all matplotlib calls are done by a draw thread, so the script can continue while the
+                      figures are drawn. The figNr is then also updated by the draw thread. The data passed to the plot_*()
+                      and image_*() methods must not be modified until wait_plots() returns. A GUI backend must not be
+                      used from another thread, so asyncMode uses the non-interactive agg backend and the figures can
+                      only be saved by save_figure(), not shown. The queued calls are also drawn by wait_plots() at exit.
+        """
         self.verbosity = verbosity                 # Verbosity threshold used to decide whether to show the plot or not
         self.figNr = 1
+        self._figs = {}                            # Figure per figNr, for save_figure()
+        self._imCache = {}                         # AxesImage per figNr of image_two_dimensional_list(), for reuse_fig
+        self._drawQueue = None
+        self._drawThread = None
+        self._drawError = None
+        if asyncMode:
+            _import_matplotlib('agg')
+            if plt.get_backend().lower() != 'agg':
+                raise ValueError('Testplot asyncMode requires the agg backend, but matplotlib already uses %s' % plt.get_backend())
+            self._drawQueue = queue.Queue()
+            self._drawThread = threading.Thread(target=self._draw_worker, daemon=True)
+            self._drawThread.start()
+            atexit.register(self.wait_plots)   # draw the queued calls, e.g. save_figure(), before the script exits
         
-    def _represent_array(self, arr, representation='', offset=0):
+    def _draw_worker(self):
+        """Draw thread that executes the queued Testplot method calls in order"""
+        while True:
+            method, args, kwargs = self._drawQueue.get()
+            try:
+                _import_matplotlib()
+                method(self, *args, **kwargs)
+            except Exception as e:
+                if self._drawError is None:
+                    self._drawError = e       # raise it later in wait_plots()
+            finally:
+                self._drawQueue.task_done()
+        
+    def wait_plots(self):
+        """Wait until the draw thread has executed all queued calls, in asyncMode. Raise the first exception of the draw thread."""
+        if self._drawQueue is not None:
+            self._drawQueue.join()
+            if self._drawError is not None:
+                e, self._drawError = self._drawError, None
+                raise e
+        
+    def _represent_array(self, arr, representation='', offset=0, dtype=None):
         """Represent arr conform representation.
         
-        For dB* representations optionally add offset > 0 to avoid log(0).
+        For dB* representations optionally add offset > 0 to avoid log(0), and optionally return the result in dtype.
         """
-        if representation=='dB':
-            arr = 10*np.log10(np.abs(arr)+offset)
-        elif representation=='dBvolt':
-            arr = 20*np.log10(np.abs(arr)+offset)
-        elif representation=='real':
-            arr = arr.real
-        elif representation=='imag':
-            arr = arr.imag
-        elif representation=='abs':
-            arr = np.abs(arr)
-        elif representation=='rad':
-            arr = np.angle(arr)
-        elif representation=='deg':
-            arr = np.angle(arr, deg=True)
-        return arr
+        represent = c_representations.get(representation)
+        if represent is None:
+            return arr
+        return represent(arr, offset, dtype)
         
 
-    def plot_one_dimensional_list(self, vLevel, L, Lx=None, representation='', offset=0, Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None, lineFormat=None):
+    @_draw_task
+    def plot_one_dimensional_list(self, vLevel, L, Lx=None, representation='', offset=0, Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None, lineFormat=None, rasterized=False):
         """Plot list L[col] with labels
         
         . vLevel         = verbosity level, only show plot if vLevel <= self.verbosity
@@ -72,33 +219,36 @@ class Testplot:
         . representation = define data representation
         . offset         = use offset>0 to avoid log(0) in dB* representations
         . lineFormat     = format string for line color, line style and line marker, see help(plt.plot)
+        . rasterized     = when True then draw the lines as a bitmap, which only matters when save_figure() writes a vector format
+                           like pdf or svg, to avoid the vector paths of many lines
         """
-        if vLevel <= self.verbosity:
-            if Lx is None:
-                Lx = np.arange(len(L))
-            Ly = np.array(L)
-            Ly = self._represent_array(Ly, representation, offset)
-            plt.figure(self.figNr)
-            if lineFormat==None:
-                plt.plot(Lx, Ly)
-            else:
-                plt.plot(Lx, Ly, lineFormat)
-            if Xlim!=None:
-                plt.xlim(Xlim)
-            if Ylim!=None:
-                plt.ylim(Ylim)
-            plt.title(Title)
-            plt.xlabel(Xlabel)
-            if representation == '':
-                plt.ylabel(Ylabel)
-            else:
-                plt.ylabel(Ylabel + ' (%s)' % representation)
-            plt.grid(True)
-            plt.draw()   # Call draw to fix e.g. colormap settings for this figure, independent of other figures
-            self.figNr += 1
+        if vLevel > self.verbosity:
+            return
+        if Lx is None:
+            Lx = np.arange(len(L))
+        Ly = np.asarray(L)
+        Ly = self._represent_array(Ly, representation, offset)
+        self._figs[self.figNr] = plt.figure(self.figNr)
+        if lineFormat is None:
+            plt.plot(Lx, Ly, rasterized=rasterized)
+        else:
+            plt.plot(Lx, Ly, lineFormat, rasterized=rasterized)
+        if Xlim is not None:
+            plt.xlim(Xlim)
+        if Ylim is not None:
+            plt.ylim(Ylim)
+        plt.title(Title)
+        plt.xlabel(Xlabel)
+        if representation == '':
+            plt.ylabel(Ylabel)
+        else:
+            plt.ylabel(Ylabel + ' (%s)' % representation)
+        plt.grid(True)
+        self.figNr += 1
         
         
-    def plot_two_dimensional_list(self, vLevel, A, Alegend=None, Lx=None, representation='', offset=0, Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None, lineFormats=None):
+    @_draw_task
+    def plot_two_dimensional_list(self, vLevel, A, Alegend=None, Lx=None, representation='', offset=0, Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None, lineFormats=None, rasterized=False):
         """Plot two dimensional list A[row][col] as one line per row, with labels
         
         . vLevel         = verbosity level, only show plot if vLevel <= self.verbosity
@@ -108,43 +258,45 @@ class Testplot:
         . representation = define data representation
         . offset         = use offset>0 to avoid log(0) in dB* representations
         . lineFormats    = list of format strings for line color, line style and line marker, see help(plt.plot)
+        . rasterized     = when True then draw the lines as a bitmap, which only matters when save_figure() writes a vector format
+                           like pdf or svg, to avoid the vector paths of many lines
         """
-        if vLevel <= self.verbosity:
-            Ay = np.array(A)
-            Ay = self._represent_array(Ay, representation, offset)
-            plt.figure(self.figNr)
+        if vLevel > self.verbosity:
+            return
+        Ay = np.asarray(A)
+        Ay = self._represent_array(Ay, representation, offset)
+        if Lx is None:
+            Lx = np.arange(Ay.shape[-1])
+        self._figs[self.figNr] = plt.figure(self.figNr)
+        if lineFormats is None and Alegend is None:
+            plt.plot(Lx, Ay.T, rasterized=rasterized)   # plot all rows as lines in one call
+        else:
             for li,Ly in enumerate(Ay):
-                if Lx is None:
-                    Lx = np.arange(len(Ly))
-                if lineFormats==None:
-                    if Alegend==None:
-                        plt.plot(Lx, Ly)
-                    else:
-                        plt.plot(Lx, Ly, label=Alegend[li])
+                if lineFormats is None:
+                    plt.plot(Lx, Ly, label=Alegend[li], rasterized=rasterized)
                 else:
-                    if Alegend==None:
-                        plt.plot(Lx, Ly, lineFormats[li])
+                    if Alegend is None:
+                        plt.plot(Lx, Ly, lineFormats[li], rasterized=rasterized)
                     else:
-                        plt.plot(Lx, Ly, lineFormats[li], label=Alegend[li])
-                li += 1
-            if Xlim!=None:
-                plt.xlim(Xlim)
-            if Ylim!=None:
-                plt.ylim(Ylim)
-            plt.title(Title)
-            plt.xlabel(Xlabel)
-            if representation == '':
-                plt.ylabel(Ylabel)
-            else:
-                plt.ylabel(Ylabel + ' (%s)' % representation)
-            if Alegend!=None:
-                plt.legend(loc='best')
-            plt.grid(True)
-            plt.draw()   # Call draw to fix e.g. colormap settings for this figure, independent of other figures
-            self.figNr += 1
+                        plt.plot(Lx, Ly, lineFormats[li], label=Alegend[li], rasterized=rasterized)
+        if Xlim is not None:
+            plt.xlim(Xlim)
+        if Ylim is not None:
+            plt.ylim(Ylim)
+        plt.title(Title)
+        plt.xlabel(Xlabel)
+        if representation == '':
+            plt.ylabel(Ylabel)
+        else:
+            plt.ylabel(Ylabel + ' (%s)' % representation)
+        if Alegend is not None:
+            plt.legend(loc='best')
+        plt.grid(True)
+        self.figNr += 1
             
 
-    def plot_three_dimensional_list(self, vLevel, M, Aindices=None, Lx=None, representation='', offset=0, order='', Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None):
+    @_draw_task
+    def plot_three_dimensional_list(self, vLevel, M, Aindices=None, Lx=None, representation='', offset=0, order='', Title='', Xlabel='', Ylabel='', Xlim=None, Ylim=None, rasterized=False):
         """Plot a list of two dimensional lists into a list of subplots
         
         M[a][row][col] is a list of two dimensional lists A and image each A[row][col] per row in a subplot, with labels and colorbar
@@ -156,6 +308,8 @@ class Testplot:
         . representation = define data representation
         . offset         = use offset>0 to avoid log(0) in dB* representations
         . order          = order of the subplots: 'rightleft', 'leftright', 'bottomup' or default 'topdown'
+        . rasterized     = when True then draw the lines as a bitmap, which only matters when save_figure() writes a vector format
+                           like pdf or svg, to avoid the vector paths of many lines
         
         Remarks:
         . The subplot number counts from 1 instead of from 0
@@ -164,64 +318,73 @@ class Testplot:
               3   4
               5   6
         """
-        if vLevel <= self.verbosity:
-            Ma = np.array(M)
-            Na = len(M)
-            if Aindices == None:
-                Aindices = list(range(Na))
-            plt.figure(self.figNr)
+        if vLevel > self.verbosity:
+            return
+        Ma = np.asarray(M)
+        Ma = self._represent_array(Ma, representation, offset)
+        Na = len(M)
+        if Aindices is None:
+            Aindices = list(range(Na))
+        if Lx is None:
+            Lx = np.arange(Ma.shape[-1])
+        axes = self._subplots_axes(Na, order)
+        
+        for ai, Ay in enumerate(Ma):
+            ax = axes[ai]
+            ax.plot(Lx, Ay.T, rasterized=rasterized)   # plot all rows as lines in one call
+            if Xlim is not None:
+                ax.set_xlim(Xlim)
+            if Ylim is not None:
+                ax.set_ylim(Ylim)
+            ax.set_title(Title + ' [%s]' % Aindices[ai])
+            ax.set_xlabel(Xlabel)
+            if representation == '':
+                ax.set_ylabel(Ylabel)
+            else:
+                ax.set_ylabel(Ylabel + ' (%s)' % representation)
+            ax.grid(True)
             
-            for ai, Ay in enumerate(Ma):
-                Ay = self._represent_array(Ay, representation, offset)
-                
-                aI = ai + 1
-                if order=='rightleft':   
-                    plt.subplot(1, Na, Na-ai)
-                elif order=='leftright':
-                    plt.subplot(1, Na, aI)
-                elif order=='bottomup':
-                    plt.subplot(Na, 1, Na-ai)
-                else:  # default: 'topdown':
-                    plt.subplot(Na, 1, aI)
-                    
-                for Ly in Ay:
-                    if Lx is None:
-                        Lx = np.arange(len(Ly))
-                    plt.plot(Lx, Ly)
-                if Xlim!=None:
-                    plt.xlim(Xlim)
-                if Ylim!=None:
-                    plt.ylim(Ylim)
-                plt.title(Title + ' [%s]' % Aindices[ai])
-                plt.xlabel(Xlabel)
-                if representation == '':
-                    plt.ylabel(Ylabel)
-                else:
-                    plt.ylabel(Ylabel + ' (%s)' % representation)
-                plt.grid(True)
-                
-            plt.draw()   # Call draw to fix e.g. colormap settings for this figure, independent of other figures
-            self.figNr += 1
+        self.figNr += 1
 
+
+    def _subplots_axes(self, Na, order):
+        """Create figure self.figNr with Na subplots and return the list of subplot axes per A index, conform order"""
+        if order in ('rightleft', 'leftright'):
+            fig, axes = plt.subplots(1, Na, num=self.figNr, squeeze=False)
+        else:  # default: 'topdown' or 'bottomup'
+            fig, axes = plt.subplots(Na, 1, num=self.figNr, squeeze=False)
+        self._figs[self.figNr] = fig
+        axes = list(axes.flat)
+        if order in ('rightleft', 'bottomup'):
+            axes.reverse()
+        return axes
+        
             
-    def _imshow_with_colorbar(self, plt, A, cmap, extent=None):
-        showIt = len(cm.unique(cm.flatten(A))) > 1  # Somehow plt.colorbar() in Python 2.7.6 gives RuntimeWarning when all elements in A are equal, therefore only plot A if it has a different values
+    def _imshow_with_colorbar(self, ax, A, cmap, extent=None):
+        showIt = A.size > 0 and A.max() != A.min()  # Somehow plt.colorbar() in Python 2.7.6 gives RuntimeWarning when all elements in A are equal, therefore only plot A if it has a different values
         #showIt = True                               # or just ignore the RuntimeWarning
         if showIt:
+            A, extent, limits = _downsample_image(A, extent)
+            interpolation = 'none' if limits is None else 'nearest'
             if False:
                 # with aspect='auto' the image fills the figure and the colorbar has the same size, so no need to use make_axes_locatable()
-                plt.imshow(A, origin='lower', interpolation='none', aspect='auto', cmap=cmap, extent=extent)
-                plt.colorbar()
+                im = ax.imshow(A, origin='lower', interpolation=interpolation, aspect='auto', cmap=cmap, extent=extent)
+                ax.figure.colorbar(im, ax=ax)
             else:
                 # with fixed aspect ratio, the colorbar size can be matched to the image height using make_axes_locatable()
-                ax = plt.gca()    # gca = get current axes
-                im = ax.imshow(A, origin='lower', interpolation='none', aspect='auto', cmap=cmap, extent=extent)
+                im = ax.imshow(A, origin='lower', interpolation=interpolation, aspect='auto', cmap=cmap, extent=extent)
                 divider = make_axes_locatable(ax)
                 cax = divider.append_axes("right", size='5%', pad=0.1)
-                plt.colorbar(im, cax=cax)
+                ax.figure.colorbar(im, cax=cax)
+            if limits is not None:
+                ax.set_xlim(limits[0])
+                ax.set_ylim(limits[1])
+            return im
+        return None
         
             
-    def image_two_dimensional_list(self, vLevel, A, representation='', offset=0, transpose=False, grid=False, cmap='jet', Title='', Xlabel='', Ylabel='', extent=None):
+    @_draw_task
+    def image_two_dimensional_list(self, vLevel, A, representation='', offset=0, transpose=False, grid=False, cmap='jet', Title='', Xlabel='', Ylabel='', extent=None, reuse_fig=None):
         """Image two dimensional list A[row][col] per row, with labels and colorbar
         
         . vLevel         = verbosity level, only show plot if vLevel <= self.verbosity
@@ -231,25 +394,53 @@ class Testplot:
         . transpose      = when True plot transpose of A
         . cmap           = colormap, default 'jet', use e.g. 'gray' or reverse 'gray_r' for on/off data
         . extent         = use extent [left, right, bottom, top] as X and Y range of list A, or use extent=None to show the index ranges of list A
+        . reuse_fig      = when None then image A in a new figure, else redraw figure number reuse_fig of an earlier image_two_dimensional_list()
+                           call, by only updating its image data if A has the same shape
         """
-        if vLevel <= self.verbosity:
-            Ay = np.array(A)
-            if transpose:
-                Ay = np.transpose(Ay)
-            Ay = self._represent_array(Ay, representation, offset)
-            plt.figure(self.figNr)
-            plt.title(Title)
-            plt.xlabel(Xlabel)
-            if representation == '':
-                plt.ylabel(Ylabel)
-            else:
-                plt.ylabel(Ylabel + ' (%s)' % representation)
-            plt.grid(grid)
-            self._imshow_with_colorbar(plt, Ay, cmap, extent)
-            plt.draw()   # Call draw to fix e.g. colormap settings for this figure, independent of other figures
+        if vLevel > self.verbosity:
+            return
+        Ay = np.asarray(A)
+        if transpose:
+            Ay = np.transpose(Ay)
+        Ay = self._represent_array(Ay, representation, offset, np.float32)
+        Ay = _image_float32(Ay)
+        figNr = self.figNr if reuse_fig is None else reuse_fig
+        im, imShape = self._imCache.get(figNr, (None, None)) if reuse_fig is not None and plt.fignum_exists(figNr) else (None, None)
+        if im is not None and imShape != Ay.shape:
+            im = None
+        fig = plt.figure(figNr)
+        self._figs[figNr] = fig
+        if im is not None:
+            ax = im.axes
+        else:
+            if reuse_fig is not None:
+                fig.clf()
+            ax = plt.gca()    # gca = get current axes
+        ax.set_title(Title)
+        ax.set_xlabel(Xlabel)
+        if representation == '':
+            ax.set_ylabel(Ylabel)
+        else:
+            ax.set_ylabel(Ylabel + ' (%s)' % representation)
+        ax.grid(grid)
+        if im is not None:
+            # Only update the image data, to avoid the imshow and colorbar setup of a new image
+            data, extent, limits = _downsample_image(Ay, extent)
+            im.set_data(data)
+            im.set_cmap(cmap)
+            im.set_clim(data.min(), data.max())
+            if extent is not None:
+                im.set_extent(extent)
+            if limits is not None:
+                ax.set_xlim(limits[0])
+                ax.set_ylim(limits[1])
+        else:
+            self._imCache[figNr] = (self._imshow_with_colorbar(ax, Ay, cmap, extent), Ay.shape)
+        if reuse_fig is None:
             self.figNr += 1
 
          
+    @_draw_task
     def image_three_dimensional_list(self, vLevel, M, Aindices=None, representation='', offset=0, transpose=False, order='', grid=False, cmap='jet', Title='', Xlabel='', Ylabel='', extent=None):
         """Image a list of two dimensional lists into a list of subplots
         
@@ -272,95 +463,92 @@ class Testplot:
               3   4
               5   6
         """
-        if vLevel <= self.verbosity:
-            Ma = np.array(M)
-            Na = len(M)
-            if Aindices == None:
-                Aindices = list(range(Na))
-            plt.figure(self.figNr)
+        if vLevel > self.verbosity:
+            return
+        Ma = np.asarray(M)
+        if transpose:
+            Ma = Ma.transpose(0, 2, 1)
+        Ma = self._represent_array(Ma, representation, offset, np.float32)
+        Na = len(M)
+        if Aindices is None:
+            Aindices = list(range(Na))
+        axes = self._subplots_axes(Na, order)
+        
+        for ai, Ay in enumerate(Ma):
+            ax = axes[ai]
+            ax.set_title(Title + ' [%s]' % Aindices[ai])
+            ax.set_xlabel(Xlabel)
+            if representation == '':
+                ax.set_ylabel(Ylabel)
+            else:
+                ax.set_ylabel(Ylabel + ' (%s)' % representation)
+            ax.grid(grid)
             
-            for ai, Ay in enumerate(Ma):
-                if transpose:
-                    Ay = np.transpose(Ay)
-                Ay = self._represent_array(Ay, representation, offset)
-                
-                aI = ai + 1
-                if order=='rightleft':   
-                    plt.subplot(1, Na, Na-ai)
-                elif order=='leftright':
-                    plt.subplot(1, Na, aI)
-                elif order=='bottomup':
-                    plt.subplot(Na, 1, Na-ai)
-                else:  # default: 'topdown':
-                    plt.subplot(Na, 1, aI)
-                    
-                plt.title(Title + ' [%s]' % Aindices[ai])
-                plt.xlabel(Xlabel)
-                if representation == '':
-                    plt.ylabel(Ylabel)
-                else:
-                    plt.ylabel(Ylabel + ' (%s)' % representation)
-                plt.grid(grid)
-                
-                self._imshow_with_colorbar(plt, Ay, cmap, extent)
-                
-            plt.tight_layout()   # not realy necessary, because there is sufficient space between subplots when figure is manually enlarged to full screen
-            plt.draw()   # Call draw to fix e.g. colormap settings for this figure, independent of other figures
-            self.figNr += 1
+            self._imshow_with_colorbar(ax, _image_float32(Ay), cmap, extent)
+            
+        plt.tight_layout()   # not realy necessary, because there is sufficient space between subplots when figure is manually enlarged to full screen
+        self.figNr += 1
 
         
+    @_draw_task
     def save_figure(self, figName, figNr=None):
         """Save figure to figName.png file
         
            Must call plt.savefig() before plt.show(), because otherwise the file is empty.
         """
-        if figNr==None:
-            plt.figure(self.figNr-1)   # plot last figure
-        else:
-            plt.figure(figNr)          # plot selected figure
-        plt.savefig(figName)
+        if figNr is None:
+            figNr = self.figNr-1       # plot last figure
+        fig = self._figs.get(figNr)    # plot selected figure
+        if fig is None:
+            fig = plt.figure(figNr)
+        fig.savefig(figName)
 
 
     def plot_ion(self):
         """Equivalent to interactive mode plt.ion(). Shows plot immediately on the screen and keeps the plot while the script continues."""
+        self.wait_plots()   # the interactive mode is set in the caller thread, also in asyncMode
+        _import_matplotlib()
         plt.ion()
 
     def plot_ioff(self):
         """Equivalent non-interactive mode plt.iof(). Requires using plt.show() to show plot on the screen. The script stalls until the user manually closes the plot."""
+        self.wait_plots()
+        _import_matplotlib()
         plt.ioff()
             
     def show_plots(self):
-        """Show all plots on the screen and wait until they are closed again manually."""
-        plt.show()
+        """Show all plots on the screen and wait until they are closed again manually.
+        
+           The plot_*() and image_*() methods do not draw their figure, the figures are rendered here by plt.show() or by
+           plt.savefig() in save_figure(). In asyncMode this only waits until all figures are drawn, because the agg
+           backend cannot show them.
+        """
+        self.wait_plots()
+        if self._drawQueue is None:
+            _import_matplotlib()
+            plt.show()
          
+    @_draw_task
     def close_plots(self):
         """Close all plots."""
         plt.close('all')
+        self._figs.clear()
+        self._imCache.clear()
         
 
 if __name__ == '__main__':
     tc = Testplot()
      
     Nx = 20
-    Lx = list(range(Nx))
-    L = cm.create_multidimensional_list([Nx], 0)    # = [0] * Nx
-    for x in Lx:
-        L[x] = x * x
+    x = np.arange(Nx)
+    L = x * x
 
     Ny = 10
-    A = cm.create_multidimensional_list([Ny, Nx], 0)
-    for y in range(Ny):
-        for x in Lx:
-            A[y][x] = (y+1)*x*x
+    A = (np.arange(Ny)[:, None] + 1) * x * x                 # A[y][x] = (y+1)*x*x
 
     Na = 4
-    M = cm.create_multidimensional_list([Na, Ny, Nx], 0)
-    Aindices = []
-    for a in range(Na):
-        Aindices.append(a*a)
-        for y in range(Ny):
-            for x in Lx:
-                M[a][y][x] = (y+1)*x*x + a*x
+    M = A[None, :, :] + np.arange(Na)[:, None, None] * x     # M[a][y][x] = (y+1)*x*x + a*x
+    Aindices = (np.arange(Na)**2).tolist()
     
     Xlim = None
     Ylim = None # [0, 1000]